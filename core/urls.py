@@ -1,11 +1,14 @@
 from django.urls import path
 from core.views import *
-from core.views.attack_move_reinforce import FleetAttackView
+from core.views.attack_move_reinforce import FleetAttackView, FleetEtaView, FleetMovementListView, \
+    SimulateBattleView
 from core.views.constructing_troops import *
 
 urlpatterns = [
 
     # View galaxy map urls
+    path('galaxy/<int:galaxy>/map/', GalaxyMapView.as_view(), name='galaxy_map'),
+    path('map/', VisibleMapView.as_view(), name='visible_map'),
 
     # Building view urls
     path('planet/<str:planet_id>/<str:related_name>/upgrade/', BuildingUpgradeView.as_view(),
@@ -13,9 +16,13 @@ urlpatterns = [
     path('planet/<str:planet_id>/<str:related_name>/<str:resource_type>/upgrade/', BuildingUpgradeView.as_view(),
          name='mine_upgrade'),
     path('planet/<str:planet_id>/<str:related_name>/cancel/', BuildingCancelUpgradeView.as_view(), name='cancel_building_upgrade'),
+    path('planet/<str:planet_id>/upgrade_queue/', UpgradeQueueView.as_view(), name='upgrade_queue'),
+    path('planet/<str:planet_id>/upgrade_queue/<int:entry_id>/', UpgradeQueueEntryView.as_view(),
+         name='upgrade_queue_entry'),
 
 
     # Construct Troops:
+    path('forge/<uuid:forge_id>/construct/', ConstructTroopsView.as_view(), name='construct_troops'),
     path('construct_infantry_units/<uuid:forge_id>/<int:count>/', ConstructInfantryView.as_view(), name='construct_infantry'),
     path('construct_bombers/<int:forge_id>/<int:count>/', ConstructBombersView.as_view(), name='construct-bombers'),
     path('construct_assault_tanks/<int:forge_id>/<int:count>/', ConstructAssaultTanksView.as_view(), name='construct-assault-tanks'),
@@ -26,6 +33,9 @@ urlpatterns = [
 
 
     # Constructing Fleets
+    path('fleets/', FleetListView.as_view(), name='fleet-list'),
+    path('fleets/eta/', FleetEtaView.as_view(), name='fleet-eta'),
+    path('fleets/movements/', FleetMovementListView.as_view(), name='fleet-movements'),
     path('fleets/create/', FleetCreateView.as_view(), name='fleet-create'),
     path('fleets/create-all/', FleetCreateWithAllTroopsView.as_view(), name='fleet-create-all'),
     path('fleets/<uuid:pk>/remove-units/', FleetRemoveUnitsView.as_view(), name='fleet-remove-units'),
@@ -34,4 +44,5 @@ urlpatterns = [
 
     # Launch attack
     path('fleets/<uuid:pk>/attack/', FleetAttackView.as_view(), name='fleet-attack'),
+    path('simulate-battle/', SimulateBattleView.as_view(), name='simulate-battle'),
 ]
\ No newline at end of file
@@ -1,13 +1,19 @@
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import generics, status
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-import math
-
-from game_engine.models import Fleet, Planet
-from game_engine.serializers import FleetSerializer
-from game_engine.utilities_functions import process_attack
+from game_engine.background.fleet_movements import send_fleet
+from game_engine.constants.troop_stats import TROOP_INDEX, TROOP_NAMES
+from game_engine.models import Fleet, FleetMovement, Planet
+from game_engine.serializers import FleetMovementSerializer, FleetSerializer
+from game_engine.utilities_functions.combat import simulate_battle_cached
+from game_engine.utilities_functions.travel import fleet_travel_time, fleet_travel_times, planet_coordinates
 
 
 class FleetAttackView(generics.UpdateAPIView):
@@ -22,10 +28,12 @@ class FleetAttackView(generics.UpdateAPIView):
 
     """
     permission_classes = [IsAuthenticated]
-    queryset = Fleet.objects.all()
     serializer_class = FleetSerializer
     lookup_field = 'pk'
 
+    def get_queryset(self):
+        return Fleet.objects.filter(planet__owner=self.request.user)
+
     def update(self, request, *args, **kwargs):
         attacker_fleet = self.get_object()
         defender_planet_id = request.data.get('defender_planet_id')
@@ -33,17 +41,107 @@ class FleetAttackView(generics.UpdateAPIView):
         if not defender_planet_id:
             return Response({'error': 'Defender planet ID is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        attacker_planet = attacker_fleet.planet
         defender_planet = get_object_or_404(Planet, id=defender_planet_id)
+        if not attacker_fleet.unit_count:
+            return Response({'error': 'Fleet has no troops'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # TODO:Calculate the distance between planets
-
-        distance = math.sqrt((defender_planet.x - attacker_planet.x) ** 2 + (defender_planet.y - attacker_planet.y) ** 2)
-        travel_time = distance / attacker_fleet.speed
+        travel_time = fleet_travel_time(attacker_fleet, defender_planet.id)
 
-        # Schedule the Celery task to process the attack
-        process_attack.apply_async((attacker_fleet.id, defender_planet.id), countdown=travel_time)
+        # The attack is resolved when the fleet arrives
+        success, movement = send_fleet(attacker_fleet, defender_planet, FleetMovement.ATTACK, travel_time)
+        if not success:
+            return Response({'error': movement}, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = self.get_serializer(attacker_fleet)
-        return Response(serializer.data)
+        return Response({**serializer.data, 'movement': FleetMovementSerializer(movement).data})
+
+
+class FleetEtaView(APIView):
+    """
+    Previews how long each of the player's fleets would take to reach a planet, with a GET request to the
+    /fleets/eta/?target={planet_id} endpoint. travel_time is in seconds, null for fleets without troops.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        target_planet_id = request.query_params.get('target', '')
+        try:
+            planet_coordinates(target_planet_id)
+        except ValueError:
+            return Response({'error': 'Invalid target planet ID'}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        fleets = list(Fleet.objects.filter(planet__owner=request.user).only('id', 'name', 'planet_id', 'speed'))
+        travel_times = fleet_travel_times(fleets, target_planet_id)
+        return Response([{
+            'fleet': fleet.id,
+            'name': fleet.name,
+            'planet': fleet.planet_id,
+            'travel_time': int(seconds) if seconds >= 0 else None,
+            'arrives_at': now + timedelta(seconds=int(seconds)) if seconds >= 0 else None,
+        } for fleet, seconds in zip(fleets, travel_times)])
+
+
+class FleetMovementListView(generics.ListAPIView):
+    """
+    Lists the fleets in transit from or to the player's planets, soonest arrival first, with a GET request to the
+    /fleets/movements/ endpoint.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = FleetMovementSerializer
+
+    def get_queryset(self):
+        return FleetMovement.objects.filter(Q(origin__owner=self.request.user) | Q(target__owner=self.request.user)) \
+            .select_related('fleet').order_by('arrives_at')
+
+
+
+
+class SimulateBattleView(APIView):
+    """
+    Projects the outcome of a battle without touching any fleet or army, with a POST request to the /simulate-battle/
+    endpoint:
+
+        {
+            "attacker": {"Infantry": 100, "AssaultTanks": 20},
+            "defender": {"Sentinels": 80}
+        }
+
+    Responds with the winner, the loss ratio, both sides' hp and the units each side would lose.
+    """
+    permission_classes = [IsAuthenticated]
+    # Largest count accepted per troop, far above any real army and low enough for the hp totals to fit in int64
+    max_count = 10 ** 9
+
+    @classmethod
+    def count_tuple(cls, counts):
+        """
+        The counts as a tuple over TROOP_NAMES, or None if they are not {troop_name: count} with counts from 0 to
+        max_count.
+        """
+        if not isinstance(counts, dict):
+            return None
+        vector = [0] * len(TROOP_NAMES)
+        for troop_name, count in counts.items():
+            if troop_name not in TROOP_INDEX or type(count) is not int or not 0 <= count <= cls.max_count:
+                return None
+            vector[TROOP_INDEX[troop_name]] = count
+        return tuple(vector)
+
+    def post(self, request, *args, **kwargs):
+        attacker = self.count_tuple(request.data.get('attacker', {}))
+        defender = self.count_tuple(request.data.get('defender', {}))
+        if attacker is None or defender is None:
+            return Response({'error': 'Invalid troop counts'}, status=status.HTTP_400_BAD_REQUEST)
 
+        outcome = simulate_battle_cached(attacker, defender)
+        return Response({
+            'winner': outcome['winner'],
+            'loss_ratio': outcome['loss_ratio'],
+            'attacker_hp': outcome['attacker_hp'],
+            'defender_hp': outcome['defender_hp'],
+            'attacker_losses': {troop_name: count for troop_name, count in zip(TROOP_NAMES, outcome['attacker_losses'])
+                                if count},
+            'defender_losses': {troop_name: count for troop_name, count in zip(TROOP_NAMES, outcome['defender_losses'])
+                                if count},
+        })
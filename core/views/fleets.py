@@ -1,14 +1,39 @@
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from game_engine.background.troop_construction import settle_construction
 from game_engine.constants.game_constrants import TROOP_CHOICES
-from game_engine.models import Fleet, Forge
+from game_engine.models import Fleet, FleetMovement, Forge
 from game_engine.serializers import FleetSerializer
+from game_engine.utilities_functions.troops import move_troops, troop_counts
+
+
+class FleetListView(generics.ListAPIView):
+    """
+    Lists the player's fleets with a GET request to the '/fleets/' endpoint, optionally only those of one planet
+    (?planet=some-planet-id) and sorted by a summary column (?ordering=-attack_hp). The summaries are stored on the
+    fleets, so listing never adds up their troops.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    serializer_class = FleetSerializer
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['name', 'unit_count', 'attack_hp', 'defense_hp', 'cargo_space', 'speed']
+    ordering = ['planet', 'name']
+
+    def get_queryset(self):
+        queryset = Fleet.objects.filter(planet__owner=self.request.user).prefetch_related('troop_counts')
+        planet_id = self.request.query_params.get('planet')
+        if planet_id:
+            queryset = queryset.filter(planet_id=planet_id)
+        return queryset
 
 
-# TODO: Error Handling for trying to make fleets with invalid amounts
 class FleetCreateView(generics.CreateAPIView):
     """
     Now, players can create new fleets by sending a POST request to the '/fleets/create/' endpoint with the planet ID and
@@ -38,20 +63,25 @@ class FleetCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         planet_id = self.request.data.get('planet')
         forge = get_object_or_404(Forge, planet_id=planet_id)
+        settle_construction(forge.army_id)
         fleet_number = Fleet.objects.filter(planet_id=planet_id).count() + 1
         fleet_name = f'Fleet #{fleet_number:02d}'
 
         # Get troop counts from the request data
-        troop_counts = self.request.data.get('troops', [])
+        counts = {}
+        for (troop_name, _), count in zip(TROOP_CHOICES, self.request.data.get('troops', [])):
+            if not isinstance(count, int) or count < 0:
+                raise ValidationError({'error': 'Invalid troop count'})
+            if count:
+                counts[troop_name] = count
 
         # Transfer troops from the Forge to the new fleet
-        for (troop_name, _), count in zip(TROOP_CHOICES, troop_counts):
-            forge.army.troops[troop_name] -= count
-            serializer.validated_data['troops'][troop_name] = count
-
-        forge.army.save()
-
-        serializer.save(name=fleet_name, planet_id=planet_id)
+        with transaction.atomic():
+            fleet = serializer.save(name=fleet_name, planet_id=planet_id)
+            success, troop_name = move_troops(counts, {'army_id': forge.army_id}, {'fleet_id': fleet.pk})
+            if not success:
+                raise ValidationError({'error': f'Not enough {troop_name} in the Forge'})
+        fleet.refresh_from_db()
 
 
 class FleetCreateWithAllTroopsView(generics.CreateAPIView):
@@ -74,17 +104,18 @@ class FleetCreateWithAllTroopsView(generics.CreateAPIView):
     def perform_create(self, serializer):
         planet_id = self.request.data.get('planet')
         forge = get_object_or_404(Forge, planet_id=planet_id)
+        settle_construction(forge.army_id)
         fleet_number = Fleet.objects.filter(planet_id=planet_id).count() + 1
         fleet_name = f'Fleet #{fleet_number:02d}'
 
         # Transfer all available troops from the Forge to the new fleet
-        for troop_name in forge.army.troops:
-            serializer.validated_data['troops'][troop_name] = forge.army.troops[troop_name]
-            forge.army.troops[troop_name] = 0
-
-        forge.army.save()
-
-        serializer.save(name=fleet_name, planet_id=planet_id)
+        with transaction.atomic():
+            fleet = serializer.save(name=fleet_name, planet_id=planet_id)
+            counts = troop_counts({'army_id': forge.army_id})
+            success, troop_name = move_troops(counts, {'army_id': forge.army_id}, {'fleet_id': fleet.pk})
+            if not success:
+                raise ValidationError({'error': f'Not enough {troop_name} in the Forge'})
+        fleet.refresh_from_db()
 
 
 class FleetRemoveUnitsView(generics.UpdateAPIView):
@@ -111,21 +142,23 @@ class FleetRemoveUnitsView(generics.UpdateAPIView):
 
     def update(self, request, *args, **kwargs):
         fleet = self.get_object()
+        if FleetMovement.objects.filter(fleet=fleet).exists():
+            return Response({'error': 'Fleet is in transit'}, status=status.HTTP_400_BAD_REQUEST)
         planet_id = fleet.planet_id
         forge = get_object_or_404(Forge, planet_id=planet_id)
+        settle_construction(forge.army_id)
 
         troops_to_remove = request.data.get('troops', {})
 
         # Remove troops from the fleet and return them to the Forge
         for troop_name, count in troops_to_remove.items():
-            if count <= 0 or count > fleet.troops.get(troop_name, 0):
+            if not isinstance(count, int) or count <= 0:
                 return Response({'error': 'Invalid troop count'}, status=status.HTTP_400_BAD_REQUEST)
 
-            fleet.troops[troop_name] -= count
-            forge.army.troops[troop_name] += count
-
-        fleet.save()
-        forge.army.save()
+        success, _ = move_troops(troops_to_remove, {'fleet_id': fleet.pk}, {'army_id': forge.army_id})
+        if not success:
+            return Response({'error': 'Invalid troop count'}, status=status.HTTP_400_BAD_REQUEST)
+        fleet.refresh_from_db()
 
         serializer = self.get_serializer(fleet)
         return Response(serializer.data)
@@ -145,16 +178,15 @@ class FleetRemoveAllUnitsView(generics.UpdateAPIView):
 
     def update(self, request, *args, **kwargs):
         fleet = self.get_object()
+        if FleetMovement.objects.filter(fleet=fleet).exists():
+            return Response({'error': 'Fleet is in transit'}, status=status.HTTP_400_BAD_REQUEST)
         planet_id = fleet.planet_id
         forge = get_object_or_404(Forge, planet_id=planet_id)
+        settle_construction(forge.army_id)
 
         # Remove all troops from the fleet and return them to the Forge
-        for troop_name in fleet.troops:
-            forge.army.troops[troop_name] += fleet.troops[troop_name]
-            fleet.troops[troop_name] = 0
-
-        fleet.save()
-        forge.army.save()
+        move_troops(troop_counts({'fleet_id': fleet.pk}), {'fleet_id': fleet.pk}, {'army_id': forge.army_id})
+        fleet.refresh_from_db()
 
         serializer = self.get_serializer(fleet)
         return Response(serializer.data)
@@ -173,12 +205,13 @@ class FleetDisbandView(generics.DestroyAPIView):
     lookup_field = 'pk'
 
     def perform_destroy(self, instance):
+        if FleetMovement.objects.filter(fleet=instance).exists():
+            raise ValidationError({'error': 'Fleet is in transit'})
         planet_id = instance.planet_id
         forge = get_object_or_404(Forge, planet_id=planet_id)
+        settle_construction(forge.army_id)
 
         # Return all troops from the fleet to the Forge before deleting the fleet
-        for troop_name in instance.troops:
-            forge.army.troops[troop_name] += instance.troops[troop_name]
-
-        forge.army.save()
-        instance.delete()
+        with transaction.atomic():
+            move_troops(troop_counts({'fleet_id': instance.pk}), {'fleet_id': instance.pk}, {'army_id': forge.army_id})
+            instance.delete()
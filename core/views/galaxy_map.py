@@ -1,18 +1,57 @@
-
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from game_engine.models import Map
-from game_engine.utilities_functions.map_data import generate_map_data
+from game_engine.utilities_functions.map_data import generate_map_data, map_etag, map_galaxies, map_slots, \
+    map_viewer, visible_page_galaxies
 
 
 class GalaxyMapView(APIView):
+    """
+    The galaxy's slots within the player's map range, with a GET request to /galaxy/{galaxy}/map/. Responses carry an
+    ETag; send it back in If-None-Match to get 304 Not Modified while the map is unchanged.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, galaxy, *args, **kwargs):
-        home_galaxy = request.user.planet_set.first().galaxy
-        map_building = Map.objects.get(planet__owner=request.user)
-        map_range = map_building.range
-        map_data = generate_map_data(galaxy=galaxy, range=map_range)
-        return Response({"home_galaxy": home_galaxy, "map_data": map_data})
+        viewer = map_viewer(request.user)
+        if viewer is None:
+            return Response({"error": "Map not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        galaxies = map_galaxies(galaxy, viewer['range'], viewer['origin'])
+        etag = quote_etag(map_etag(galaxies, viewer['range'], viewer['origin']))
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        map_data = generate_map_data(galaxy=galaxy, map_range=viewer['range'], origin=viewer['origin'])
+        return Response({"home_galaxy": viewer['origin'][0], "map_data": map_data}, headers={'ETag': etag})
+
+
+class VisibleMapView(APIView):
+    """
+    The slots visible from the player's home planet within their map range, a page of galaxies at a time, with a GET
+    request to /map/?page={page}. Responses carry an ETag like GalaxyMapView's.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        viewer = map_viewer(request.user)
+        if viewer is None:
+            return Response({"error": "Map not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            page = int(request.query_params.get('page', 1))
+        except ValueError:
+            page = 0
+        if page < 1:
+            return Response({"error": "Invalid page"}, status=status.HTTP_400_BAD_REQUEST)
+
+        visible = visible_page_galaxies(viewer['origin'], viewer['range'], page)
+        etag = quote_etag(map_etag(visible['galaxies'], viewer['range'], viewer['origin']))
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        map_data = map_slots(visible['galaxies'], viewer['origin'])
+        return Response({"home_galaxy": viewer['origin'][0], **visible, "map_data": map_data}, headers={'ETag': etag})
@@ -4,14 +4,16 @@ Typical upgrade function cycle:
 --> request:
     ---> check if resource requirement is met: Yes or no
             --->  query silo and building
-                ---> subtract upgrade resources from silo and silo.save().
-                    ---> increase dynamic_resource_costs by (level+1)
+                ---> subtract upgrade resources from silo, reserved on the queue entry for refunds.
+                    ---> append the upgrade to the planet's upgrade queue, starting when the previous entry finishes
+                         increase dynamic_resource_costs by (level+1)
                          increase dynamic_upgrade_duration by (level+1)
                          building.save()
 
-                         ---> start background task:
-                              increase level by +1 after upgrade_duration passes
-                              increase building hp by +1 after upgrade_duration passes
+                         ---> once the entry finishes (applied by advance_upgrade_queue when the planet is next read,
+                              or by the planet's queue event):
+                              increase level by +1
+                              increase building hp
                               building.save()
 
 """
@@ -21,15 +23,12 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
-import datetime
 
-from game_engine.background.logic import upgrade_silo_task, upgrade_forge_task, upgrade_map_task
-# TODO update the celery tasks and location, this is just a placeholder.
-from game_engine.background.tasks import *
-from celery import app
-
-from game_engine.models import Map, Forge
-from game_engine.serializers import MineSerializer, SiloSerializer, MapSerializer, ForgeSerializer
+from game_engine.background.upgrade_queue import advance_upgrade_queue, enqueue_upgrade, move_queued_upgrade, \
+    cancel_queued_upgrade
+from game_engine.models import Planet, Mine, Silo, Map, Forge, UpgradeQueueEntry
+from game_engine.serializers import MineSerializer, SiloSerializer, MapSerializer, ForgeSerializer, \
+    UpgradeQueueEntrySerializer
 
 
 class BuildingUpgradeView(APIView):
@@ -68,39 +67,15 @@ class BuildingUpgradeView(APIView):
 
         building_type = type(building)
 
-        # Check if enough resources are available and subtract resources:
-        for resource_type, cost in building.dynamic_resource_costs.items():
-            if silo.stored_resources[resource_type] < cost:
-                return Response({"error": f"Not enough {resource_type}"}, status=status.HTTP_400_BAD_REQUEST)
-            silo.stored_resources[resource_type] -= cost
-        silo.save()
-
-        # Update the building dynamic upgrade cost resources for display
-        pseudo_level = int(building.level) + 1
-        for resource_type in building.dynamic_resource_costs:
-            building.dynamic_resource_costs[resource_type] = int(
-                building.base_resource_costs[resource_type] * pseudo_level)
-
-        # Call upgrade task with the upgrade duration
-        building_type_task_mapping = {
-            Mine: upgrade_mine_task,
-            Silo: upgrade_silo_task,
-            Map: upgrade_map_task,
-            Forge: upgrade_forge_task,
-        }
-
-        task_func = building_type_task_mapping.get(building_type)
-        task = task_func.apply_async(args=[building.id], countdown=building.dynamic_upgrade_duration.total_seconds())
-
-        # Save the task ID and start time to the building model
-        building.dynamic_upgrade_duration = pseudo_level * building.upgrade_duration
-        building.upgrade_task_id = task.id
-        building.upgrade_start_time = datetime.datetime.now()
-        building.save()
+        # Check if enough resources are available, subtract them and queue the upgrade on the planet:
+        success, result = enqueue_upgrade(planet, building, silo)
+        if not success:
+            return Response({"error": f"Not enough {result}"}, status=status.HTTP_400_BAD_REQUEST)
 
         serializer_class = self.get_serializer_class(building_type)
-        serializer = serializer_class(building)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = serializer_class(building_type.objects.with_upgrade_level().get(pk=building.pk))
+        return Response({**serializer.data, "queued_upgrade": UpgradeQueueEntrySerializer(result).data},
+                        status=status.HTTP_200_OK)
 
     def post(self, request, planet_id, related_name, resource_type=None, *args, **kwargs):
         return self.upgrade(request, planet_id, related_name, resource_type)
@@ -117,47 +92,82 @@ class BuildingCancelUpgradeView(APIView):
 
         try:
             building = getattr(planet, related_name)
-            building_type = type(building)
         except AttributeError:
             return Response({"error": f"{related_name} not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        if building.upgrade_task_id:
-            # Calculate the percentage of time lapsed
-            now = timezone.now()
-            previous_upgrade_duration = building.level * building.upgrade_duration
-            time_lapsed = now - building.upgrade_start_time
-
-            time_remaining = previous_upgrade_duration - time_lapsed
-            percentage_remaining = time_remaining / previous_upgrade_duration
-
-            # Refund resources based on percentage remaining
-            try:
-                silo = Silo.objects.get(planet=building.planet)
-            except Silo.DoesNotExist:
-                return Response({"error": "Silo not found"}, status=status.HTTP_404_NOT_FOUND)
-
-            for resource_type, cost in building.dynamic_resource_costs.items():
-                refund = int(cost * percentage_remaining)
-                silo.stored_resources[resource_type] += refund
-                silo.save()
-
-            # Revoke the upgrade task
-            app.control.revoke(building.upgrade_task_id, terminate=True)
-
-            # Clear the task ID and start time from the building model
-            building.upgrade_task_id = None
-            building.upgrade_start_time = None
-
-            # Revert dynamic upgrade costs for display:
-            for resource_type in building.dynamic_resource_costs:
-                building.dynamic_resource_costs[resource_type] = int(
-                    building.base_resource_costs[resource_type] * building.level)
-
-            building.save()
-            return Response({"status": "Upgrade task cancelled", "refunded_resources": refund},
-                            status=status.HTTP_200_OK)
-        else:
+        # Cancel the building's last queued upgrade
+        entry = UpgradeQueueEntry.objects.filter(planet=planet, building_id=building.pk).order_by('position').last()
+        if entry is None:
             return Response({"error": "No upgrade task found"}, status=status.HTTP_404_NOT_FOUND)
 
+        success, result = cancel_queued_upgrade(entry)
+        if not success:
+            return Response({"error": result}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"status": "Upgrade task cancelled", "refunded_resources": result}, status=status.HTTP_200_OK)
+
     def post(self, request, planet_id, related_name, *args, **kwargs):
         return self.cancel(request, planet_id, related_name)
+
+
+class UpgradeQueueView(APIView):
+    """
+    GET planet/{planet_id}/upgrade_queue/ lists the planet's queued upgrades in order, with their projected start and
+    finish times. Upgrades are queued with BuildingUpgradeView.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, planet_id, *args, **kwargs):
+        try:
+            planet = Planet.objects.get(id=planet_id, owner=request.user)
+        except Planet.DoesNotExist:
+            return Response({"error": "Planet not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        advance_upgrade_queue(planet.pk)
+        queue = UpgradeQueueEntry.objects.filter(planet=planet).order_by('position')
+        return Response(UpgradeQueueEntrySerializer(queue, many=True).data, status=status.HTTP_200_OK)
+
+
+class UpgradeQueueEntryView(APIView):
+    """
+    PUT planet/{planet_id}/upgrade_queue/{entry_id}/ moves a queued upgrade to another position:
+
+        data = {
+            'position': 2,
+        }
+
+    DELETE cancels it and refunds its resources, for the upgrade in progress only the share of time remaining.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_entry(self, request, planet_id, entry_id):
+        try:
+            return UpgradeQueueEntry.objects.get(pk=entry_id, planet_id=planet_id, planet__owner=request.user)
+        except UpgradeQueueEntry.DoesNotExist:
+            return None
+
+    def put(self, request, planet_id, entry_id, *args, **kwargs):
+        entry = self.get_entry(request, planet_id, entry_id)
+        if entry is None:
+            return Response({"error": "Queued upgrade not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            position = int(request.data.get('position'))
+        except (TypeError, ValueError):
+            return Response({"error": "Position is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        success, message = move_queued_upgrade(entry, position)
+        if not success:
+            return Response({"error": message}, status=status.HTTP_400_BAD_REQUEST)
+
+        queue = UpgradeQueueEntry.objects.filter(planet_id=entry.planet_id).order_by('position')
+        return Response(UpgradeQueueEntrySerializer(queue, many=True).data, status=status.HTTP_200_OK)
+
+    def delete(self, request, planet_id, entry_id, *args, **kwargs):
+        entry = self.get_entry(request, planet_id, entry_id)
+        if entry is None:
+            return Response({"error": "Queued upgrade not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        success, result = cancel_queued_upgrade(entry)
+        if not success:
+            return Response({"error": result}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"status": "Upgrade cancelled", "refunded_resources": result}, status=status.HTTP_200_OK)
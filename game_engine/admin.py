@@ -51,10 +51,12 @@ class UserAdmin(BaseUserAdmin):
 class PlanetAdmin(admin.ModelAdmin):
     inlines = [MineInline, SiloInline, ForgeInline, MapInline]
     list_display = ('id', 'name', 'owner', 'galaxy', 'planet_number')
+    list_select_related = ('owner',)
 
 
 class SiloAdmin(admin.ModelAdmin):
     list_display = ('id', 'planet', 'owner')
+    list_select_related = ('planet__owner',)
 
     def owner(self, obj):
         return obj.planet.owner
@@ -62,6 +64,11 @@ class SiloAdmin(admin.ModelAdmin):
     owner.short_description = 'Owner'
 
 
+class UserProfileAdmin(admin.ModelAdmin):
+    # Used by __str__
+    list_select_related = ('user', 'game_mode')
+
+
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
     can_delete = False
@@ -77,7 +84,7 @@ admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
 
 # Register the UserProfileAdmin
-admin.site.register(UserProfile)
+admin.site.register(UserProfile, UserProfileAdmin)
 
 # Register the PlanetAdmin
 admin.site.register(Planet, PlanetAdmin)
@@ -0,0 +1,62 @@
+"""
+Timed game events.
+
+Anything that happens after a delay (a planet's upgrade queue moving on) is stored as a GameEvent row with its due
+time instead of a delayed Celery message. The dispatch_due_events task runs every second, claims due events in
+batches and applies them with the handlers below. Fleets in transit are FleetMovements instead, see
+game_engine.background.fleet_movements.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from game_engine.background.upgrade_queue import advance_upgrade_queue
+from game_engine.models import GameEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_HANDLERS = {
+    GameEvent.ADVANCE_UPGRADE_QUEUE: advance_upgrade_queue,
+}
+
+
+def schedule_event(kind, countdown, **payload):
+    """
+    Schedules a GameEvent countdown seconds from now. payload is passed to the kind's handler as keyword arguments.
+    """
+    return GameEvent.objects.create(kind=kind, due_at=timezone.now() + timedelta(seconds=countdown), payload=payload)
+
+
+def cancel_event(event_id):
+    """
+    Cancels a scheduled event. Returns False if it was already applied.
+    """
+    deleted, _ = GameEvent.objects.filter(pk=event_id).delete()
+    return bool(deleted)
+
+
+def apply_due_events(batch_size, now=None):
+    """
+    Applies every event due by now, batch_size events per transaction. Events are claimed with SKIP LOCKED so several
+    workers can drain the table in parallel. An event whose handler fails is logged and dropped.
+    :return: the number of events applied
+    """
+    now = now or timezone.now()
+    applied = 0
+    while True:
+        with transaction.atomic():
+            events = list(GameEvent.objects.select_for_update(skip_locked=True)
+                          .filter(due_at__lte=now).order_by('due_at')[:batch_size])
+            for event in events:
+                try:
+                    with transaction.atomic():
+                        EVENT_HANDLERS[event.kind](**event.payload)
+                except Exception:
+                    logger.exception("Failed to apply %s %s", event, event.payload)
+            GameEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+
+        applied += len(events)
+        if len(events) < batch_size:
+            return applied
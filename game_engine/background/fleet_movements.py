@@ -0,0 +1,78 @@
+"""
+Fleets in transit.
+
+Sending a fleet creates a FleetMovement with its arrival time, nothing is queued in the broker. The
+process_fleet_arrivals task runs every second, claims arrived movements in batches and carries out their missions
+with the handlers below, one call per mission and target so that fleets arriving together act together.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from game_engine.models import Fleet, FleetMovement
+from game_engine.utilities_functions.process_attack import resolve_attacks
+
+logger = logging.getLogger(__name__)
+
+
+def attack(target_id, movements):
+    resolve_attacks(target_id, [movement.fleet_id for movement in movements])
+
+
+# Called with the target and the arrived movements of one mission at it
+MISSION_HANDLERS = {
+    FleetMovement.ATTACK: attack,
+}
+
+
+def send_fleet(fleet, target, mission, travel_time, now=None):
+    """
+    Sends the fleet from its planet to target, arriving travel_time seconds from now, see
+    game_engine.utilities_functions.travel.
+    :return: (True, movement), or (False, message) if the fleet is already in transit
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        # Locks the fleet so that two requests sending it at once can't both find it at home
+        list(Fleet.objects.select_for_update().filter(pk=fleet.pk).values_list('pk'))
+        if FleetMovement.objects.filter(fleet=fleet).exists():
+            return False, "Fleet is already in transit"
+        movement = FleetMovement.objects.create(fleet=fleet, origin_id=fleet.planet_id, target=target,
+                                                mission=mission, departed_at=now,
+                                                arrives_at=now + timedelta(seconds=travel_time))
+    return True, movement
+
+
+def process_arrivals(batch_size, now=None):
+    """
+    Carries out the mission of every movement arrived by now, batch_size movements per transaction. Movements are
+    claimed with SKIP LOCKED so several workers can drain arrivals in parallel, and the movements of a batch with the
+    same mission and target are handled together. A mission that fails is logged and its movements are kept with
+    failed_at set, so the fleets stay in transit until someone looks into it instead of silently vanishing.
+    :return: the number of movements processed
+    """
+    now = now or timezone.now()
+    processed = 0
+    while True:
+        with transaction.atomic():
+            movements = list(FleetMovement.objects.select_for_update(skip_locked=True)
+                             .filter(arrives_at__lte=now, failed_at__isnull=True).order_by('arrives_at')[:batch_size])
+            groups, failed = {}, []
+            for movement in movements:
+                groups.setdefault((movement.mission, movement.target_id), []).append(movement)
+            for (mission, target_id), group in groups.items():
+                try:
+                    with transaction.atomic():
+                        MISSION_HANDLERS[mission](target_id, group)
+                except Exception:
+                    logger.exception("Failed to carry out %s", ", ".join(str(movement) for movement in group))
+                    failed += [movement.pk for movement in group]
+            FleetMovement.objects.filter(pk__in=failed).update(failed_at=now)
+            FleetMovement.objects.filter(pk__in=[movement.pk for movement in movements]).exclude(pk__in=failed) \
+                .delete()
+
+        processed += len(movements)
+        if len(movements) < batch_size:
+            return processed
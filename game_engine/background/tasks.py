@@ -1,70 +1,216 @@
-from celery import shared_task
-from django.core.exceptions import ObjectDoesNotExist
+import time
+from datetime import timedelta
+from itertools import islice
 
-from game_engine.models import Planet, Silo, Mine
+from celery import chord, shared_task
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db.models import Case, DateTimeField, Exists, F, Max, Min, OuterRef, PositiveSmallIntegerField, Q, Sum, \
+    Value, When
+from django.utils import timezone
+
+from game_engine.models import Planet, Silo, Mine, ConstructionOrder, UpgradeQueueEntry, RESOURCE_FIELDS, \
+    RESOURCE_NAMES, accrual_expression, full_resources_expression, producing_gains
+from game_engine.background.events import apply_due_events
+from game_engine.background.fleet_movements import process_arrivals
+from game_engine.background.troop_construction import settle_construction
+from game_engine.utilities_functions.resource_ledger import get_silo_ledger
+
+logger = get_task_logger(__name__)
+
+
+def settle_silos(silos, chunk_size):
+    """
+    Settles the given silos chunk by chunk. Silos are streamed from a server-side cursor, and each chunk costs one
+     grouped query for the mine production of its planets and one UPDATE, however many planets it holds. The UPDATE
+     adds the production to the resource columns in SQL, so spends made in the meantime are not overwritten.
+    Silos of planets with a finished upgrade that is not applied yet are left for the planet's advance_upgrade_queue
+     event: settling them now would accrue the old mine rates past the upgrade.
+    :param silos: Silo queryset to settle
+    :param chunk_size: number of silos loaded, accrued and written back at a time
+    :return: dict with the number of silos seen and updated, and the time spent
+    """
+    started = time.monotonic()
+    totals = {"chunks": 0, "silos": 0, "updated": 0}
+    upgraded = UpgradeQueueEntry.objects.filter(planet_id=OuterRef('planet_id'), finishes_at__lte=timezone.now())
+    stream = silos.filter(~Exists(upgraded)).order_by().values_list('pk', 'planet_id', 'last_accrued_at', 'full_resources') \
+        .iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(stream, chunk_size))
+        if not chunk:
+            break
+        chunk_started = time.monotonic()
+        now = timezone.now()
+
+        # Production per planet and resource for the whole chunk in a single grouped query
+        production_rates = {}
+        mines = (Mine.objects.filter(planet_id__in=[planet_id for _, planet_id, _, _ in chunk])
+                 .values('planet_id', 'resource_type')
+                 .annotate(rate=Sum('production_rate_per_sec'))
+                 .order_by())
+        for row in mines:
+            resource_type = RESOURCE_NAMES.get(row['resource_type'].lower(), row['resource_type'])
+            production_rates.setdefault(row['planet_id'], {})[resource_type] = row['rate']
+
+        # One CASE branch per silo, guarded by last_accrued_at and full_resources in case the silo was settled or
+        # spent from concurrently. Full resources get no branch, silos with nothing left to fill are not updated.
+        settled_ids = []
+        timestamps = []
+        fulls = []
+        resources = {field: [] for field in RESOURCE_FIELDS.values()}
+        for silo_id, planet_id, last_accrued_at, full_resources in chunk:
+            elapsed_seconds = int((now - last_accrued_at).total_seconds())
+            if elapsed_seconds <= 0:
+                continue
+            gains = producing_gains(production_rates.get(planet_id, {}), elapsed_seconds, full_resources)
+            if not gains:
+                continue
+            unchanged = Q(pk=silo_id, last_accrued_at=last_accrued_at, full_resources=full_resources)
+            settled_ids.append(silo_id)
+            timestamps.append(When(unchanged, then=Value(last_accrued_at + timedelta(seconds=elapsed_seconds))))
+            fulls.append(When(unchanged, then=full_resources_expression(gains)))
+            for field, gained in gains.items():
+                resources[field].append(When(unchanged, then=accrual_expression(field, gained)))
+
+        if settled_ids:
+            changes = {field: Case(*whens, default=F(field)) for field, whens in resources.items() if whens}
+            Silo.objects.filter(pk__in=settled_ids).update(
+                last_accrued_at=Case(*timestamps, default=F('last_accrued_at'), output_field=DateTimeField()),
+                full_resources=Case(*fulls, default=F('full_resources'), output_field=PositiveSmallIntegerField()),
+                **changes)
+
+        totals["chunks"] += 1
+        totals["silos"] += len(chunk)
+        totals["updated"] += len(settled_ids)
+        logger.info("Settled silo chunk %d: %d silos, %d updated in %.1f ms", totals["chunks"], len(chunk),
+                    len(settled_ids), (time.monotonic() - chunk_started) * 1000)
+
+    totals["seconds"] = round(time.monotonic() - started, 3)
+    return totals
+
+
+@shared_task(bind=True)
+def settle_galaxy_range(self, first_galaxy, last_galaxy, chunk_size=None):
+    """
+    Settles the silos of every planet whose galaxy lies in [first_galaxy, last_galaxy]. One shard of
+     update_silos_with_mine_production.
+    """
+    chunk_size = chunk_size or settings.SILO_SETTLE_CHUNK_SIZE
+    silos = Silo.objects.filter(full_resources__lt=Silo.ALL_FULL, planet__galaxy__range=(first_galaxy, last_galaxy))
+    totals = settle_silos(silos, chunk_size)
+    totals["galaxies"] = [first_galaxy, last_galaxy]
+    logger.info("Settled galaxies %d-%d: %d of %d silos in %ss", first_galaxy, last_galaxy, totals["updated"],
+                totals["silos"], totals["seconds"])
+    return totals
+
+
+@shared_task(bind=True)
+def summarize_silo_settlement(self, shard_totals):
+    """
+    Chord callback of update_silos_with_mine_production, adds up the totals of all shards. Since shards run in
+     parallel, the slowest shard is the wall-clock time of the whole settlement.
+    """
+    summary = {
+        "shards": len(shard_totals),
+        "chunks": sum(totals["chunks"] for totals in shard_totals),
+        "silos": sum(totals["silos"] for totals in shard_totals),
+        "updated": sum(totals["updated"] for totals in shard_totals),
+        "slowest_shard_seconds": max((totals["seconds"] for totals in shard_totals), default=0),
+    }
+    logger.info("Settled %(updated)d of %(silos)d silos across %(shards)d shards (slowest %(slowest_shard_seconds)ss)",
+                summary)
+    return summary
 
 
 @shared_task(bind=True)
-def update_silos_with_mine_production(self):
+def update_silos_with_mine_production(self, chunk_size=None, galaxies_per_shard=None):
     """
-    This function is a Celery shared task that calculates and adds the resource production from all mines on each planet
-     to their respective silos. It loops through all the planets, retrieves their associated silo and mines, calculates
-     the resource increase for the past 1 second(s), updates the silo's stored resources, and saves the changes.
+    This function is a Celery shared task that settles every silo, i.e. accrues the mine production since each silo's
+     last_accrued_at into its stored resources and saves the changes. Silos are also settled lazily whenever they are
+     read or spent from, so this periodic sweep only keeps the stored values of idle planets reasonably fresh.
+
+    Resources at max_capacity (Silo.full_resources) are skipped: production can't change them until a spend of them
+     or a capacity upgrade clears their bit. Silos that are full on every resource are not even loaded.
+
+    The planets are split into ranges of galaxies_per_shard galaxies and each range is settled by its own
+     settle_galaxy_range task, so the sweep spreads over all available workers. A chord collects the shard totals.
     :param self:
-    :return:
+    :param chunk_size: silos per batch, defaults to settings.SILO_SETTLE_CHUNK_SIZE
+    :param galaxies_per_shard: defaults to settings.SILO_SETTLE_GALAXIES_PER_SHARD, 0 settles everything inline
+    :return: totals reported by settle_silos when run inline, otherwise the number of shards dispatched
+
+    With the redis ledger Postgres only receives the write-behind of flush_silo_ledger, so the sweep does nothing.
     """
-    # Retrieve all planet instances
-    planets = Planet.objects.all()
+    if settings.SILO_LEDGER == 'redis':
+        # Balances live in Redis and flush_silo_ledger is the only writer of the resource columns
+        return {"skipped": "redis ledger"}
 
-    # Loop through each planet instance
-    for planet in planets:
+    chunk_size = chunk_size or settings.SILO_SETTLE_CHUNK_SIZE
+    if galaxies_per_shard is None:
+        galaxies_per_shard = settings.SILO_SETTLE_GALAXIES_PER_SHARD
 
-        try:
-            # Try to get the Silo instance associated with the current planet
-            silo = planet.silo
+    if not galaxies_per_shard:
+        totals = settle_silos(Silo.objects.filter(full_resources__lt=Silo.ALL_FULL), chunk_size)
+        logger.info("Settled %(updated)d of %(silos)d silos in %(chunks)d chunks (%(seconds)ss)", totals)
+        return totals
 
-        except Silo.DoesNotExist:
-            # If the Silo does not exist for the current planet, skip to the next iteration
-            continue
+    bounds = Planet.objects.aggregate(first=Min('galaxy'), last=Max('galaxy'))
+    if bounds["first"] is None:
+        return {"shards": 0}
 
-        # Retrieve all Mine instances associated with the current planet
-        mines = Mine.objects.filter(planet=planet)
+    shards = [
+        settle_galaxy_range.s(first, min(first + galaxies_per_shard - 1, bounds["last"]), chunk_size)
+        for first in range(bounds["first"], bounds["last"] + 1, galaxies_per_shard)
+    ]
+    chord(shards)(summarize_silo_settlement.s())
+    return {"shards": len(shards)}
 
-        # Loop through each Mine instance
-        for mine in mines:
-            # Get the resource type produced by the mine
-            resource_type = mine.resource_type
 
-            # Calculate the increase in resources produced by the mine in the last 1 seconds
-            resource_increase = mine.production_rate_per_sec * 1  # Multiply by 1 seconds
+@shared_task(bind=True)
+def flush_silo_ledger(self, batch_size=None):
+    """
+    Write-behind of the redis silo ledger: persists the balances of silos changed since the last flush to Postgres,
+     batch_size silos per bulk UPDATE.
+    """
+    if settings.SILO_LEDGER != 'redis':
+        return 0
+    flushed = get_silo_ledger().flush(batch_size or settings.SILO_SETTLE_CHUNK_SIZE)
+    if flushed:
+        logger.info("Flushed %d silos from the ledger", flushed)
+    return flushed
 
-            # Update the stored resources in the Silo, ensuring it does not exceed the max capacity
-            silo.stored_resources[resource_type] = min(
-                silo.stored_resources[resource_type] + resource_increase,
-                silo.max_capacity,
-            )
 
-        # Save the updated Silo instance
-        silo.save()
+@shared_task(bind=True)
+def dispatch_due_events(self, batch_size=None):
+    """
+    Applies all GameEvents that are due, see game_engine.background.events.
+    """
+    applied = apply_due_events(batch_size or settings.GAME_EVENT_BATCH_SIZE)
+    if applied:
+        logger.info("Applied %d game events", applied)
+    return applied
 
-    # Return a string indicating the task is complete
-    return "Done"
+
+@shared_task(bind=True)
+def process_fleet_arrivals(self, batch_size=None):
+    """
+    Carries out the missions of all fleets that have arrived, see game_engine.background.fleet_movements.
+    """
+    processed = process_arrivals(batch_size or settings.FLEET_ARRIVAL_BATCH_SIZE)
+    if processed:
+        logger.info("Processed %d fleet arrivals", processed)
+    return processed
 
 
 @shared_task(bind=True)
-def upgrade_mine_task(mine_id):
-    try:
-        mine = Mine.objects.get(id=mine_id)
-    except ObjectDoesNotExist:
-        return
-
-    # Upgrade the mine level, hp and production:
-    mine.level += 1
-    mine.hp += 100 * mine.level
-    mine.production_rate_per_sec += 1
-
-    # Clear the task ID and start time from the Mine model
-    mine.upgrade_task_id = None
-    mine.upgrade_start_time = None
-
-    mine.save()
+def settle_construction_orders(self):
+    """
+    Delivers finished troop units of armies nobody has read since, see game_engine.background.troop_construction.
+    """
+    now = timezone.now()
+    army_ids = ConstructionOrder.objects.filter(next_unit_at__lte=now).values_list('army_id', flat=True).distinct()
+    delivered = sum(settle_construction(army_id, now) for army_id in army_ids)
+    if delivered:
+        logger.info("Delivered %d troop units", delivered)
+    return delivered
@@ -0,0 +1,108 @@
+"""
+Troop construction orders.
+
+An order of any size is a single ConstructionOrder row, nothing is scheduled per unit. Units finish one every
+unit_time after the order starts, and settle_construction moves the units finished by now into the army's
+TroopCount rows: it is called before an army's troops are read or changed, and for every army with units due by the
+settle_construction_orders task.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from game_engine.constants.game_constrants import TROOPS_DATA, TROOP_COSTS, TROOP_DATA_KEYS
+from game_engine.background.upgrade_queue import advance_upgrade_queue
+from game_engine.models import Army, ConstructionOrder, Silo, TroopCount
+from game_engine.utilities_functions.resource_ledger import get_silo_ledger
+
+
+def troop_order_costs(counts):
+    """
+    Resources needed to construct counts ({troop_name: count}).
+    """
+    costs = {}
+    for troop_name, count in counts.items():
+        for resource_type, cost in TROOP_COSTS[TROOP_DATA_KEYS.get(troop_name, troop_name)].items():
+            costs[resource_type] = costs.get(resource_type, 0) + cost * count
+    return costs
+
+
+def place_construction_order(army, silo, counts, now=None):
+    """
+    Takes the cost of counts ({troop_name: count}) from the silo and starts constructing them, one ConstructionOrder per
+    troop, in one transaction that holds locks on the army and silo rows. Each troop's units finish one every
+    construction_time seconds. The transaction must be the outermost one (durable), so that a ledger outside the
+    database can credit the spend back if it does not commit.
+    :return: (True, orders), or (False, message)
+    """
+    now = now or timezone.now()
+    # Finished mine and silo upgrades change what the silo holds by now
+    advance_upgrade_queue(silo.planet_id, now)
+
+    ledger = get_silo_ledger()
+    spent = False
+    try:
+        with transaction.atomic(durable=True):
+            list(Army.objects.select_for_update().filter(pk=army.pk).values_list('pk'))
+            list(Silo.objects.select_for_update().filter(pk=silo.pk).values_list('pk'))
+
+            orders = []
+            for troop_name, count in counts.items():
+                started = TroopCount.objects.filter(army_id=army.pk, troop_name=troop_name) \
+                    .update(in_construction=F('in_construction') + count)
+                if not started:
+                    transaction.set_rollback(True)
+                    return False, f"Unknown troop {troop_name}."
+                unit_time = timedelta(
+                    seconds=TROOPS_DATA[TROOP_DATA_KEYS.get(troop_name, troop_name)]['construction_time'])
+                orders.append(ConstructionOrder(army=army, troop_name=troop_name, count=count, unit_time=unit_time,
+                                                started_at=now, next_unit_at=now + unit_time))
+            ConstructionOrder.objects.bulk_create(orders)
+
+            # Spend last, so that nothing else can fail once the silo is charged
+            costs = troop_order_costs(counts)
+            spent, resource_type = ledger.spend(silo, costs)
+            if not spent:
+                transaction.set_rollback(True)
+                return False, f"Not enough {resource_type} in the Silo."
+    except Exception:
+        # The orders are gone, so are the resources unless they are given back
+        if spent and not ledger.transactional:
+            ledger.credit(silo, costs)
+        raise
+    return True, orders
+
+
+def settle_construction(army_id, now=None):
+    """
+    Moves the units of the army's orders finished by now from in_construction to count, and deletes the orders that
+    are complete. The army's orders are locked while they are settled.
+    :return: the number of units moved
+    """
+    now = now or timezone.now()
+    if not ConstructionOrder.objects.filter(army_id=army_id, next_unit_at__lte=now).exists():
+        return 0
+
+    with transaction.atomic():
+        orders = list(ConstructionOrder.objects.select_for_update().filter(army_id=army_id, next_unit_at__lte=now))
+
+        moved = 0
+        complete = []
+        for order in orders:
+            finished = min(order.count, (now - order.started_at) // order.unit_time)
+            TroopCount.objects.filter(army_id=army_id, troop_name=order.troop_name).update(
+                count=F('count') + (finished - order.delivered),
+                in_construction=F('in_construction') - (finished - order.delivered))
+            moved += finished - order.delivered
+
+            order.delivered = finished
+            order.next_unit_at = order.started_at + (finished + 1) * order.unit_time
+            if finished == order.count:
+                complete.append(order.pk)
+
+        ConstructionOrder.objects.bulk_update([order for order in orders if order.pk not in complete],
+                                              ['delivered', 'next_unit_at'])
+        ConstructionOrder.objects.filter(pk__in=complete).delete()
+    return moved
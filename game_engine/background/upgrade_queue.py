@@ -0,0 +1,151 @@
+"""
+Per-planet building upgrade queue.
+
+Upgrades are queued with enqueue_upgrade and run one at a time in queue order. Every entry's start and finish time is
+projected when it is queued (or the queue is reordered), so nothing has to run when an upgrade finishes: finished
+entries are applied by advance_upgrade_queue, which is called before a planet's buildings are read and by the
+planet's single advance_upgrade_queue GameEvent, due when the first entry finishes.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from game_engine.background.logic import BUILDING_UPGRADES
+from game_engine.models import Planet, GameEvent, UpgradeQueueEntry
+from game_engine.utilities_functions.resource_ledger import get_silo_ledger
+
+BUILDING_CLASSES = {building_class.__name__: building_class for building_class in BUILDING_UPGRADES}
+
+
+def lock_planet(planet_id):
+    """
+    Serializes changes to the planet's queue until the end of the transaction.
+    """
+    list(Planet.objects.select_for_update().filter(pk=planet_id).values_list('pk'))
+
+
+def schedule_queue_event(planet_id, queue):
+    """
+    Replaces the planet's advance_upgrade_queue event with one due when the first entry of queue finishes.
+    """
+    GameEvent.objects.filter(kind=GameEvent.ADVANCE_UPGRADE_QUEUE, planet_id=planet_id).delete()
+    if queue:
+        GameEvent.objects.create(kind=GameEvent.ADVANCE_UPGRADE_QUEUE, due_at=queue[0].finishes_at,
+                                 planet_id=planet_id, payload={'planet_id': str(planet_id)})
+
+
+def project(queue, starts_at):
+    """
+    Chains the entries of queue, in order, from starts_at and numbers their positions.
+    """
+    for position, entry in enumerate(queue):
+        entry.position = position
+        entry.starts_at = starts_at
+        entry.finishes_at = starts_at + entry.duration
+        starts_at = entry.finishes_at
+    UpgradeQueueEntry.objects.bulk_update(queue, ['position', 'starts_at', 'finishes_at'])
+
+
+def advance_upgrade_queue(planet_id, now=None):
+    """
+    Applies the planet's queued upgrades that have finished by now, in queue order.
+    :return: the number of upgrades applied
+    """
+    now = now or timezone.now()
+    if not UpgradeQueueEntry.objects.filter(planet_id=planet_id, finishes_at__lte=now).exists():
+        return 0
+
+    with transaction.atomic():
+        lock_planet(planet_id)
+        queue = list(UpgradeQueueEntry.objects.filter(planet_id=planet_id).order_by('position'))
+        finished = [entry for entry in queue if entry.finishes_at <= now]
+        for entry in finished:
+            building = BUILDING_CLASSES[entry.building_type].objects.get(pk=entry.building_id)
+            BUILDING_UPGRADES[type(building)](building, entry.finishes_at)
+        UpgradeQueueEntry.objects.filter(pk__in=[entry.pk for entry in finished]).delete()
+        schedule_queue_event(planet_id, queue[len(finished):])
+    return len(finished)
+
+
+def enqueue_upgrade(planet, building, silo):
+    """
+    Takes the cost of the building's next upgrade from the silo and queues the upgrade at the end of the planet's
+    queue.
+    :return: (True, entry), or (False, resource_type) for the first resource that is short
+    """
+    advance_upgrade_queue(planet.pk)
+    with transaction.atomic():
+        lock_planet(planet.pk)
+        queue = list(UpgradeQueueEntry.objects.filter(planet=planet).order_by('position'))
+        building = type(building).objects.get(pk=building.pk)
+        building.queued_upgrade_count = sum(queued.building_id == building.pk for queued in queue)
+
+        costs = building.dynamic_resource_costs
+        success, resource_type = get_silo_ledger().spend(silo, costs)
+        if not success:
+            return False, resource_type
+
+        starts_at = queue[-1].finishes_at if queue else timezone.now()
+        entry = UpgradeQueueEntry.objects.create(
+            planet=planet, building=building, building_type=type(building).__name__,
+            position=queue[-1].position + 1 if queue else 0, reserved_resources=dict(costs),
+            duration=building.dynamic_upgrade_duration, starts_at=starts_at,
+            finishes_at=starts_at + building.dynamic_upgrade_duration)
+        if not queue:
+            schedule_queue_event(planet.pk, [entry])
+    return True, entry
+
+
+def move_queued_upgrade(entry, position):
+    """
+    Moves a queued upgrade to position in the planet's queue and re-projects the queue. The upgrade in progress stays
+    first.
+    :return: (success, message)
+    """
+    advance_upgrade_queue(entry.planet_id)
+    with transaction.atomic():
+        lock_planet(entry.planet_id)
+        queue = list(UpgradeQueueEntry.objects.filter(planet_id=entry.planet_id).order_by('position'))
+        ids = [queued.pk for queued in queue]
+        if entry.pk not in ids:
+            return False, "Upgrade already finished"
+        if ids.index(entry.pk) == 0:
+            return False, "Upgrade already in progress"
+
+        waiting = [queued for queued in queue[1:] if queued.pk != entry.pk]
+        waiting.insert(max(position, 1) - 1, queue[ids.index(entry.pk)])
+        # The first entry's finish, and so the queue's event, does not change
+        project([queue[0]] + waiting, queue[0].starts_at)
+    return True, "Upgrade moved"
+
+
+def cancel_queued_upgrade(entry, now=None):
+    """
+    Removes a queued upgrade and refunds its reserved resources, for the upgrade in progress only the share of its
+    duration that is left. The upgrades after it move up.
+    :return: (True, refunds), or (False, message)
+    """
+    now = now or timezone.now()
+    advance_upgrade_queue(entry.planet_id, now)
+    with transaction.atomic():
+        lock_planet(entry.planet_id)
+        queue = list(UpgradeQueueEntry.objects.filter(planet_id=entry.planet_id).order_by('position'))
+        ids = [queued.pk for queued in queue]
+        if entry.pk not in ids:
+            return False, "Upgrade already finished"
+        in_progress = ids[0] == entry.pk
+        entry = queue.pop(ids.index(entry.pk))
+
+        remaining = 1
+        if in_progress:
+            remaining = (entry.finishes_at - now) / entry.duration if entry.duration else 0
+        refunds = {resource_type: int(cost * remaining) for resource_type, cost in entry.reserved_resources.items()}
+        silo = entry.planet.silo
+        get_silo_ledger().credit(silo, refunds)
+
+        entry.delete()
+        if in_progress:
+            project(queue, now)
+            schedule_queue_event(entry.planet_id, queue)
+        else:
+            project(queue, queue[0].starts_at)
+    return True, refunds
@@ -29,6 +29,17 @@ BUILDING_COSTS = {
     },
     # Add other building types and costs here
 }
+# Cost of each resource per level for building types not in BUILDING_COSTS
+DEFAULT_BUILDING_COST = 100
+# Seconds to upgrade a level 1 building, each level takes that much longer
+BUILDING_UPGRADE_DURATION = 5
+
+# MAP CONSTANTS:
+PLANETS_PER_GALAXY = 10
+# Distance between neighbouring galaxies, and between neighbouring planets of a galaxy. Troop speeds are in distance
+# per hour.
+GALAXY_DISTANCE = 20000
+PLANET_DISTANCE = 1000
 
 # TROOPS CONSTANTS:
 
@@ -107,6 +118,19 @@ TROOP_CHOICES = [
 ]
 
 
+# TROOPS_DATA / TROOP_COSTS key of each troop, by the name used in TROOP_CHOICES and Army.troops.
+# Special troops use the same name everywhere.
+TROOP_DATA_KEYS = {
+    'Infantry': 'Infantry_units',
+    'AssaultTanks': 'Assault_Tanks',
+    'DroneTroopers': 'Drone_Troopers',
+    'Sentinels': 'Sentinels',
+    'Harvesters': 'Harvesters',
+    'Bombers': 'Bombers',
+    'Marauders': 'Marauders',
+}
+
+
 TROOPS_DATA = {
     'Infantry_units': {
         'attack_hp': 100,
@@ -0,0 +1,52 @@
+"""
+Building upgrade costs and durations by building type and level, compiled once from BUILDING_COSTS.
+
+Upgrading a building from level n costs n times its base cost and takes n times BUILDING_UPGRADE_DURATION. Building
+types without an entry in BUILDING_COSTS cost DEFAULT_BUILDING_COST of every resource per level.
+"""
+from datetime import timedelta
+
+from game_engine.constants.game_constrants import BUILDING_COSTS, BUILDING_UPGRADE_DURATION, DEFAULT_BUILDING_COST, \
+    RESOURCE_CHOICES
+
+# Levels held in the tables, costs of higher levels are computed when asked for
+PRECOMPUTED_LEVELS = 200
+
+
+class LevelCurve:
+
+    def __init__(self, base_costs, base_duration):
+        self.base_costs = base_costs
+        self.base_duration = base_duration
+        # Indexed by level, level 0 does not exist
+        self.costs = [None] + [self.compute_cost(level) for level in range(1, PRECOMPUTED_LEVELS + 1)]
+        self.durations = [None] + [level * base_duration for level in range(1, PRECOMPUTED_LEVELS + 1)]
+
+    def compute_cost(self, level):
+        return {resource_type: int(cost * level) for resource_type, cost in self.base_costs.items()}
+
+    def cost(self, level):
+        """
+        Resources needed to upgrade a building from level. The dict is shared, copy it before changing it.
+        """
+        if level < len(self.costs):
+            return self.costs[level]
+        return self.compute_cost(level)
+
+    def duration(self, level):
+        if level < len(self.durations):
+            return self.durations[level]
+        return level * self.base_duration
+
+
+DEFAULT_LEVEL_CURVE = LevelCurve({resource_type: DEFAULT_BUILDING_COST for resource_type, _ in RESOURCE_CHOICES},
+                                 timedelta(seconds=BUILDING_UPGRADE_DURATION))
+
+LEVEL_CURVES = {
+    building_type: LevelCurve(costs, timedelta(seconds=BUILDING_UPGRADE_DURATION))
+    for building_type, costs in BUILDING_COSTS.items()
+}
+
+
+def get_level_curve(building_type):
+    return LEVEL_CURVES.get(building_type, DEFAULT_LEVEL_CURVE)
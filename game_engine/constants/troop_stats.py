@@ -0,0 +1,50 @@
+"""
+Troop stats as a matrix, compiled once from TROOPS_DATA.
+
+Row i of TROOP_STATS holds the stats of TROOP_NAMES[i], column j the stat STAT_NAMES[j]. A fleet is a count vector over
+TROOP_NAMES (or a batch of fleets a count matrix, one row per fleet), so its totals are a dot product with a column and
+its speed a masked min. Troops are named as in TROOP_CHOICES and Army.troops, special troops as in TROOPS_DATA.
+"""
+import numpy as np
+
+from game_engine.constants.game_constrants import TROOP_CHOICES, TROOPS_DATA, TROOP_DATA_KEYS
+
+TROOP_NAMES = [troop_name for troop_name, _ in TROOP_CHOICES] + \
+    [troop_name for troop_name in TROOPS_DATA if troop_name not in TROOP_DATA_KEYS.values()]
+TROOP_INDEX = {troop_name: index for index, troop_name in enumerate(TROOP_NAMES)}
+
+STAT_NAMES = ['attack_hp', 'defense_hp', 'speed', 'cargo_space', 'construction_time', 'helium_3_tax']
+STAT_INDEX = {stat_name: index for index, stat_name in enumerate(STAT_NAMES)}
+
+TROOP_STATS = np.array([[TROOPS_DATA[TROOP_DATA_KEYS.get(troop_name, troop_name)][stat_name]
+                         for stat_name in STAT_NAMES] for troop_name in TROOP_NAMES], dtype=np.int64)
+TROOP_STATS.flags.writeable = False
+
+
+def troop_stat(troop_name, stat_name):
+    return int(TROOP_STATS[TROOP_INDEX[troop_name], STAT_INDEX[stat_name]])
+
+
+def count_vector(counts):
+    """
+    Count vector of counts ({troop_name: count}).
+    """
+    vector = np.zeros(len(TROOP_NAMES), dtype=np.int64)
+    for troop_name, count in counts.items():
+        vector[TROOP_INDEX[troop_name]] += count
+    return vector
+
+
+def stat_totals(counts, stat_name):
+    """
+    Sum of stat_name over the units of a count vector, or of every row of a count matrix.
+    """
+    return counts @ TROOP_STATS[:, STAT_INDEX[stat_name]]
+
+
+def max_travel_speeds(counts):
+    """
+    Speed of the slowest troop present in a count vector, or in every row of a count matrix, 0 without troops.
+    """
+    speeds = np.where(counts > 0, TROOP_STATS[:, STAT_INDEX['speed']], np.iinfo(np.int64).max).min(axis=-1)
+    return np.where(counts.any(axis=-1), speeds, 0)
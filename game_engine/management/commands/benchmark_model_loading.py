@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from game_engine.models import Army, Building, Fleet, Forge, Map, Mine, Planet, Silo, TroopCount, UserProfile
+
+MODELS = {model.__name__: model for model in
+          [UserProfile, Planet, Building, Mine, Silo, Forge, Map, Army, Fleet, TroopCount]}
+
+
+class Command(BaseCommand):
+    help = "Measures how many instances per second each game model is loaded at when iterating a large queryset, " \
+           "e.g. after seed_players."
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help=f"Any of {', '.join(MODELS)}, all if none are given")
+        parser.add_argument('--limit', type=int, default=50000, help="Rows loaded per run")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per model, the fastest is reported")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        unknown = set(options['models']) - set(MODELS)
+        if unknown:
+            raise CommandError(f"Unknown models: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(f"{'model':<12}{'rows':>10}{'queries':>10}{'seconds':>10}{'per second':>14}")
+        for name in options['models'] or MODELS:
+            queryset = MODELS[name].objects.order_by()[:options['limit']]
+            best = None
+            for _ in range(options['repeat']):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    rows = sum(1 for _ in queryset.iterator(chunk_size=options['chunk_size']))
+                    elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+
+            # Queries of the last run: the chunked reads, anything more is per-instance work
+            per_second = rows / best if best else float('inf')
+            self.stdout.write(f"{name:<12}{rows:>10}{len(queries):>10}{best:>10.3f}{per_second:>14,.0f}")
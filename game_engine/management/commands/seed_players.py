@@ -0,0 +1,47 @@
+import re
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from game_engine.utilities_functions.onboarding import create_starting_worlds
+
+
+class Command(BaseCommand):
+    help = "Creates synthetic players with their starting worlds, batch_size players per transaction, for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int)
+        parser.add_argument('--prefix', default='loadtest', help="Usernames are the prefix followed by a number")
+        parser.add_argument('--password', default=None, help="Shared by every player, unusable if not given")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    @staticmethod
+    def next_number(prefix):
+        """
+        The number after the highest one taken by a prefix + number username, so reruns and deleted players never
+        lead to a duplicate username.
+        """
+        numbers = User.objects.filter(username__regex=rf'^{re.escape(prefix)}[0-9]+$') \
+            .values_list('username', flat=True)
+        return max((int(username[len(prefix):]) for username in numbers.iterator()), default=-1) + 1
+
+    def handle(self, *args, **options):
+        prefix, count, batch_size = options['prefix'], options['count'], options['batch_size']
+        # Hashed once for everyone, hashing per player would take longer than creating the worlds
+        password = make_password(options['password'])
+        first = self.next_number(prefix)
+
+        for start in range(first, first + count, batch_size):
+            numbers = range(start, min(start + batch_size, first + count))
+            with transaction.atomic():
+                # bulk_create skips the post_save signal, the worlds are created for the whole batch instead
+                users = User.objects.bulk_create([
+                    User(username=f'{prefix}{number}', email=f'{prefix}{number}@example.com', password=password)
+                    for number in numbers
+                ])
+                create_starting_worlds(users)
+            self.stdout.write(f"Created players {prefix}{numbers[0]} to {prefix}{numbers[-1]}")
+
+        self.stdout.write(self.style.SUCCESS(f"Seeded {count} players"))
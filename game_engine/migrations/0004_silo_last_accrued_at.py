@@ -0,0 +1,19 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:35
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0003_alter_userprofile_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='silo',
+            name='last_accrued_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
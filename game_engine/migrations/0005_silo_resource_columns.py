@@ -0,0 +1,58 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:40
+
+from django.db import migrations, models
+
+
+def copy_stored_resources_to_columns(apps, schema_editor):
+    Silo = apps.get_model('game_engine', 'Silo')
+    silos = list(Silo.objects.only('stored_resources'))
+    for silo in silos:
+        stored_resources = silo.stored_resources or {}
+        for resource_type in ('Boron', 'Oxygen', 'Uranium', 'Helium'):
+            if resource_type in stored_resources:
+                setattr(silo, resource_type.lower(), max(int(stored_resources[resource_type]), 0))
+    Silo.objects.bulk_update(silos, ['boron', 'oxygen', 'uranium', 'helium'], batch_size=500)
+
+
+def copy_columns_to_stored_resources(apps, schema_editor):
+    Silo = apps.get_model('game_engine', 'Silo')
+    silos = list(Silo.objects.only('boron', 'oxygen', 'uranium', 'helium'))
+    for silo in silos:
+        silo.stored_resources = {resource_type: getattr(silo, resource_type.lower())
+                                 for resource_type in ('Boron', 'Oxygen', 'Uranium', 'Helium')}
+    Silo.objects.bulk_update(silos, ['stored_resources'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0004_silo_last_accrued_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='silo',
+            name='boron',
+            field=models.PositiveIntegerField(default=10000),
+        ),
+        migrations.AddField(
+            model_name='silo',
+            name='helium',
+            field=models.PositiveIntegerField(default=10000),
+        ),
+        migrations.AddField(
+            model_name='silo',
+            name='oxygen',
+            field=models.PositiveIntegerField(default=10000),
+        ),
+        migrations.AddField(
+            model_name='silo',
+            name='uranium',
+            field=models.PositiveIntegerField(default=10000),
+        ),
+        migrations.RunPython(copy_stored_resources_to_columns, copy_columns_to_stored_resources),
+        migrations.RemoveField(
+            model_name='silo',
+            name='stored_resources',
+        ),
+    ]
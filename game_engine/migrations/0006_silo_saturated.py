@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0005_silo_resource_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='silo',
+            name='saturated',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0006_silo_saturated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('upgrade_building', 'Upgrade building'), ('construct_troop', 'Construct troop'), ('attack', 'Attack')], max_length=32)),
+                ('due_at', models.DateTimeField(db_index=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['due_at'],
+            },
+        ),
+    ]
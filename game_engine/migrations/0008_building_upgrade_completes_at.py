@@ -0,0 +1,46 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+def set_upgrade_completes_at(apps, schema_editor):
+    Building = apps.get_model('game_engine', 'Building')
+    GameEvent = apps.get_model('game_engine', 'GameEvent')
+
+    # Upgrades in flight finish when their event was due
+    events = GameEvent.objects.filter(kind='upgrade_building')
+    for event in events:
+        Building.objects.filter(pk=event.payload['building_id'], upgrade_start_time__isnull=False) \
+            .update(upgrade_completes_at=event.due_at)
+    events.delete()
+
+    # Upgrades started as countdown tasks ran for the duration of the level they started at
+    buildings = list(Building.objects.filter(upgrade_start_time__isnull=False, upgrade_completes_at__isnull=True))
+    for building in buildings:
+        building.upgrade_completes_at = building.upgrade_start_time + building.level * building.upgrade_duration
+    Building.objects.bulk_update(buildings, ['upgrade_completes_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0007_gameevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='upgrade_completes_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(set_upgrade_completes_at, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='building',
+            name='upgrade_task_id',
+        ),
+        migrations.AlterField(
+            model_name='gameevent',
+            name='kind',
+            field=models.CharField(choices=[('construct_troop', 'Construct troop'), ('attack', 'Attack')], max_length=32),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def queue_upgrades_in_progress(apps, schema_editor):
+    GameEvent = apps.get_model('game_engine', 'GameEvent')
+    UpgradeQueueEntry = apps.get_model('game_engine', 'UpgradeQueueEntry')
+
+    # Upgrades used to run side by side, queue each planet's in completion order
+    upgrading = []
+    for building_type in ('Mine', 'Silo', 'Map', 'Forge'):
+        building_class = apps.get_model('game_engine', building_type)
+        for building in building_class.objects.filter(upgrade_completes_at__isnull=False):
+            upgrading.append((building.planet_id, building.upgrade_completes_at, building_type, building))
+
+    queues = {}
+    for planet_id, completes_at, building_type, building in sorted(upgrading, key=lambda upgrade: upgrade[:2]):
+        queue = queues.setdefault(planet_id, [])
+        queue.append(UpgradeQueueEntry(
+            planet_id=planet_id, building_id=building.pk, building_type=building_type, position=len(queue),
+            reserved_resources={resource_type: int(cost * building.level)
+                                for resource_type, cost in building.base_resource_costs.items()},
+            duration=completes_at - building.upgrade_start_time, starts_at=building.upgrade_start_time,
+            finishes_at=completes_at))
+
+    for planet_id, queue in queues.items():
+        UpgradeQueueEntry.objects.bulk_create(queue)
+        GameEvent.objects.create(kind='advance_upgrade_queue', due_at=queue[0].finishes_at,
+                                 payload={'planet_id': str(planet_id)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0008_building_upgrade_completes_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gameevent',
+            name='kind',
+            field=models.CharField(choices=[('construct_troop', 'Construct troop'), ('attack', 'Attack'), ('advance_upgrade_queue', 'Advance upgrade queue')], max_length=32),
+        ),
+        migrations.CreateModel(
+            name='UpgradeQueueEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('building_type', models.CharField(max_length=10)),
+                ('position', models.PositiveIntegerField()),
+                ('reserved_resources', models.JSONField(default=dict)),
+                ('duration', models.DurationField()),
+                ('starts_at', models.DateTimeField()),
+                ('finishes_at', models.DateTimeField(db_index=True)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queued_upgrades', to='game_engine.building')),
+                ('planet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upgrade_queue', to='game_engine.planet')),
+            ],
+            options={
+                'ordering': ['planet', 'position'],
+            },
+        ),
+        migrations.RunPython(queue_upgrades_in_progress, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='building',
+            name='upgrade_completes_at',
+        ),
+        migrations.RemoveField(
+            model_name='building',
+            name='upgrade_start_time',
+        ),
+    ]
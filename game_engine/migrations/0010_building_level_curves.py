@@ -0,0 +1,29 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:51
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0009_upgradequeueentry'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='building',
+            name='base_resource_costs',
+        ),
+        migrations.RemoveField(
+            model_name='building',
+            name='dynamic_resource_costs',
+        ),
+        migrations.RemoveField(
+            model_name='building',
+            name='dynamic_upgrade_duration',
+        ),
+        migrations.RemoveField(
+            model_name='building',
+            name='upgrade_duration',
+        ),
+    ]
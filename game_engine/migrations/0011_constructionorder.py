@@ -0,0 +1,56 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:53
+
+from datetime import timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def convert_troop_events_to_orders(apps, schema_editor):
+    GameEvent = apps.get_model('game_engine', 'GameEvent')
+    ConstructionOrder = apps.get_model('game_engine', 'ConstructionOrder')
+
+    # One event per unit, due one construction time apart: one order per army and troop
+    events = GameEvent.objects.filter(kind='construct_troop').order_by('due_at')
+    units = {}
+    for event in events:
+        units.setdefault((event.payload['army_id'], event.payload['troop_name']), []).append(event.due_at)
+
+    orders = []
+    for (army_id, troop_name), due_times in units.items():
+        unit_time = (due_times[-1] - due_times[0]) / (len(due_times) - 1) if len(due_times) > 1 else timedelta(seconds=1)
+        orders.append(ConstructionOrder(army_id=army_id, troop_name=troop_name, count=len(due_times),
+                                        unit_time=unit_time, started_at=due_times[0] - unit_time,
+                                        next_unit_at=due_times[0]))
+    ConstructionOrder.objects.bulk_create(orders, batch_size=500)
+    events.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0010_building_level_curves'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gameevent',
+            name='kind',
+            field=models.CharField(choices=[('attack', 'Attack'), ('advance_upgrade_queue', 'Advance upgrade queue')], max_length=32),
+        ),
+        migrations.CreateModel(
+            name='ConstructionOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('troop_name', models.CharField(max_length=50)),
+                ('count', models.PositiveIntegerField()),
+                ('delivered', models.PositiveIntegerField(default=0)),
+                ('unit_time', models.DurationField()),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('next_unit_at', models.DateTimeField(db_index=True)),
+                ('army', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='construction_orders', to='game_engine.army')),
+            ],
+        ),
+        migrations.RunPython(convert_troop_events_to_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_troops_to_rows(apps, schema_editor):
+    Army = apps.get_model('game_engine', 'Army')
+    Fleet = apps.get_model('game_engine', 'Fleet')
+    TroopCount = apps.get_model('game_engine', 'TroopCount')
+
+    rows = []
+    for army in Army.objects.only('troops').iterator():
+        for troop_name, troop in (army.troops or {}).items():
+            # Armies held {'count': ..., 'in_construction': ...}, older ones a bare count
+            if isinstance(troop, dict):
+                count, in_construction = troop.get('count', 0), troop.get('in_construction', 0)
+            else:
+                count, in_construction = troop, 0
+            rows.append(TroopCount(army=army, troop_name=troop_name, count=max(int(count), 0),
+                                   in_construction=max(int(in_construction), 0)))
+    for fleet in Fleet.objects.only('troops').iterator():
+        for troop_name, count in (fleet.troops or {}).items():
+            if isinstance(count, dict):
+                count = count.get('count', 0)
+            rows.append(TroopCount(fleet=fleet, troop_name=troop_name, count=max(int(count), 0)))
+    TroopCount.objects.bulk_create(rows, batch_size=500)
+
+
+def copy_rows_to_troops(apps, schema_editor):
+    Army = apps.get_model('game_engine', 'Army')
+    Fleet = apps.get_model('game_engine', 'Fleet')
+    TroopCount = apps.get_model('game_engine', 'TroopCount')
+
+    armies, fleets = {}, {}
+    for row in TroopCount.objects.all().iterator():
+        if row.army_id:
+            armies.setdefault(row.army_id, {})[row.troop_name] = {'count': row.count,
+                                                                 'in_construction': row.in_construction}
+        else:
+            fleets.setdefault(row.fleet_id, {})[row.troop_name] = row.count
+    for army_id, troops in armies.items():
+        Army.objects.filter(pk=army_id).update(troops=troops)
+    for fleet_id, troops in fleets.items():
+        Fleet.objects.filter(pk=fleet_id).update(troops=troops)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0011_constructionorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TroopCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('troop_name', models.CharField(max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('in_construction', models.PositiveIntegerField(default=0)),
+                ('army', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='troop_counts', to='game_engine.army')),
+                ('fleet', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='troop_counts', to='game_engine.fleet')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='troopcount',
+            constraint=models.UniqueConstraint(fields=('army', 'troop_name'), name='unique_army_troop'),
+        ),
+        migrations.AddConstraint(
+            model_name='troopcount',
+            constraint=models.UniqueConstraint(fields=('fleet', 'troop_name'), name='unique_fleet_troop'),
+        ),
+        migrations.RunPython(copy_troops_to_rows, copy_rows_to_troops),
+        migrations.RemoveField(
+            model_name='army',
+            name='troops',
+        ),
+        migrations.RemoveField(
+            model_name='fleet',
+            name='troops',
+        ),
+    ]
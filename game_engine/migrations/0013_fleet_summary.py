@@ -0,0 +1,73 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+# attack_hp, defense_hp, cargo_space and speed of each troop by TroopCount.troop_name, as they were when this migration
+# was written. Frozen here so later balance changes to TROOPS_DATA don't change what the migration computes.
+TROOP_STATS = {
+    'Infantry': (100, 25, 120, 9000),
+    'AssaultTanks': (250, 70, 50, 11000),
+    'DroneTroopers': (175, 150, 180, 15000),
+    'Sentinels': (80, 150, 100, 8000),
+    'Harvesters': (25, 20, 1000, 20000),
+    'Bombers': (15, 15, 1, 10000),
+    'Marauders': (15, 15, 450, 17000),
+    'Gaea Guardians': (500, 500, 250, 10000),
+    'Phoenix Sentinels': (400, 500, 100, 12000),
+    'Stormbringer Ravagers': (500, 400, 250, 15000),
+}
+
+
+def summarize_fleets(apps, schema_editor):
+    Fleet = apps.get_model('game_engine', 'Fleet')
+    TroopCount = apps.get_model('game_engine', 'TroopCount')
+
+    fleets = {fleet.pk: fleet for fleet in Fleet.objects.all()}
+    # Every fleet's troops in one query
+    rows = TroopCount.objects.filter(fleet__isnull=False, count__gt=0).values_list('fleet_id', 'troop_name', 'count')
+    for fleet_id, troop_name, count in rows.iterator(chunk_size=2000):
+        attack_hp, defense_hp, cargo_space, speed = TROOP_STATS[troop_name]
+        fleet = fleets[fleet_id]
+        fleet.unit_count += count
+        fleet.attack_hp += count * attack_hp
+        fleet.defense_hp += count * defense_hp
+        fleet.cargo_space += count * cargo_space
+        fleet.speed = min(fleet.speed, speed) if fleet.speed else speed
+    Fleet.objects.bulk_update(fleets.values(), ['unit_count', 'attack_hp', 'defense_hp', 'cargo_space', 'speed'],
+                              batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0012_troop_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fleet',
+            name='attack_hp',
+            field=models.PositiveBigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='fleet',
+            name='cargo_space',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fleet',
+            name='defense_hp',
+            field=models.PositiveBigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='fleet',
+            name='speed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fleet',
+            name='unit_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(summarize_fleets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.6 on 2026-10-18 07:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def convert_attack_events_to_movements(apps, schema_editor):
+    GameEvent = apps.get_model('game_engine', 'GameEvent')
+    Fleet = apps.get_model('game_engine', 'Fleet')
+    FleetMovement = apps.get_model('game_engine', 'FleetMovement')
+
+    events = GameEvent.objects.filter(kind='attack').order_by('due_at')
+    for event in events:
+        fleet = Fleet.objects.filter(pk=event.payload['attacker_fleet_id']).first()
+        # A fleet travels on one mission at a time, the earliest attack wins
+        if fleet is None or FleetMovement.objects.filter(fleet=fleet).exists():
+            continue
+        FleetMovement.objects.create(fleet=fleet, origin_id=fleet.planet_id,
+                                     target_id=event.payload['defender_planet_id'], mission='attack',
+                                     departed_at=event.created_at, arrives_at=event.due_at)
+    events.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0013_fleet_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FleetMovement',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('mission', models.CharField(choices=[('attack', 'Attack')], max_length=32)),
+                ('departed_at', models.DateTimeField()),
+                ('arrives_at', models.DateTimeField(db_index=True)),
+                ('fleet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='movement', to='game_engine.fleet')),
+                ('origin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_movements', to='game_engine.planet')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_movements', to='game_engine.planet')),
+            ],
+            options={
+                'ordering': ['arrives_at'],
+                'indexes': [models.Index(fields=['origin', 'arrives_at'], name='game_engine_origin__03a20c_idx'), models.Index(fields=['target', 'arrives_at'], name='game_engine_target__f7bebd_idx')],
+            },
+        ),
+        migrations.RunPython(convert_attack_events_to_movements, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='gameevent',
+            name='kind',
+            field=models.CharField(choices=[('advance_upgrade_queue', 'Advance upgrade queue')], max_length=32),
+        ),
+    ]
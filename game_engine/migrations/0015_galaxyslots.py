@@ -0,0 +1,32 @@
+# Generated by Django 4.2.6 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+def fill_galaxy_slots(apps, schema_editor):
+    Planet = apps.get_model('game_engine', 'Planet')
+    GalaxySlots = apps.get_model('game_engine', 'GalaxySlots')
+
+    occupied = {}
+    for galaxy, planet_number in Planet.objects.values_list('galaxy', 'planet_number').iterator():
+        occupied[galaxy] = occupied.get(galaxy, 0) | 1 << (planet_number - 1)
+    GalaxySlots.objects.bulk_create([GalaxySlots(galaxy=galaxy, occupied=bits) for galaxy, bits in occupied.items()],
+                                    batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0014_fleetmovement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GalaxySlots',
+            fields=[
+                ('galaxy', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('occupied', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_galaxy_slots, migrations.RunPython.noop),
+    ]
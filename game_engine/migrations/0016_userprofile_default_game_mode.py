@@ -0,0 +1,20 @@
+# Generated by Django 4.2.6 on 2026-10-18 07:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import game_engine.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0015_galaxyslots'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='game_mode',
+            field=models.ForeignKey(default=game_engine.models.default_game_mode, on_delete=django.db.models.deletion.CASCADE, to='game_engine.gamemode'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.6 on 2026-10-18 08:02
+
+from django.db import migrations, models
+
+
+def set_full_resources(apps, schema_editor):
+    Silo = apps.get_model('game_engine', 'Silo')
+    silos = list(Silo.objects.only('boron', 'oxygen', 'uranium', 'helium', 'max_capacity'))
+    for silo in silos:
+        silo.full_resources = sum(1 << index for index, field in enumerate(('boron', 'oxygen', 'uranium', 'helium'))
+                                  if getattr(silo, field) >= silo.max_capacity)
+    Silo.objects.bulk_update(silos, ['full_resources'], batch_size=500)
+
+
+def set_saturated(apps, schema_editor):
+    Silo = apps.get_model('game_engine', 'Silo')
+    Silo.objects.filter(full_resources=0b1111).update(saturated=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0016_userprofile_default_game_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='silo',
+            name='full_resources',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(set_full_resources, set_saturated),
+        migrations.RemoveField(
+            model_name='silo',
+            name='saturated',
+        ),
+    ]
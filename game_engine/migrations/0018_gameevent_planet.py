@@ -0,0 +1,34 @@
+# Generated by Django 4.2.6 on 2026-10-18 08:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_event_planets(apps, schema_editor):
+    GameEvent = apps.get_model('game_engine', 'GameEvent')
+    Planet = apps.get_model('game_engine', 'Planet')
+    events = list(GameEvent.objects.filter(kind='advance_upgrade_queue'))
+    planet_ids = set(Planet.objects.filter(pk__in=[event.payload.get('planet_id') for event in events])
+                     .values_list('pk', flat=True))
+    for event in events:
+        event.planet_id = event.payload.get('planet_id')
+    # Events of planets deleted since would now violate the foreign key
+    GameEvent.objects.filter(pk__in=[event.pk for event in events if event.planet_id not in planet_ids]).delete()
+    GameEvent.objects.bulk_update([event for event in events if event.planet_id in planet_ids], ['planet'],
+                                  batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0017_silo_full_resources'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameevent',
+            name='planet',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='game_engine.planet'),
+        ),
+        migrations.RunPython(set_event_planets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game_engine', '0018_gameevent_planet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fleetmovement',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,14 +1,18 @@
 import uuid
 from datetime import timedelta
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import JSONField, Sum
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, JSONField, Q, Sum, Value, When
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
 import random
 
 from game_engine.constants.game_constrants import PLAYER_CLASS_CHOICES, CELESTIAL_WORDS, ASTROPHYSICS_WORDS, \
-    GREEK_WORDS, TROOP_CHOICES, TROOPS_DATA, RESOURCE_CHOICES, BUILDING_COSTS
+    GREEK_WORDS, TROOP_CHOICES, RESOURCE_CHOICES, PLANETS_PER_GALAXY
+from game_engine.constants.level_curves import get_level_curve
+from game_engine.constants.troop_stats import count_vector, stat_totals, max_travel_speeds
 
 
 class GameMode(models.Model):
@@ -26,10 +30,16 @@ class GameMode(models.Model):
         return self.name
 
 
+def default_game_mode():
+    """
+    Primary key of the Classical GameMode, looked up when a profile is created rather than when models are imported.
+    """
+    return GameMode.objects.get_or_create(name=GameMode.CLASSICAL)[0].pk
+
+
 class UserProfile(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='profiles')
-    # Use the primary key of the GameMode instance as the default value
-    game_mode = models.ForeignKey(GameMode, on_delete=models.CASCADE, default=GameMode.objects.get_or_create(name='Classical')[0].id)
+    game_mode = models.ForeignKey(GameMode, on_delete=models.CASCADE, default=default_game_mode)
     display_name = models.CharField(max_length=50, unique=True)
     orion_credits = models.PositiveIntegerField(default=1000)
     population = models.PositiveIntegerField(default=0)
@@ -41,17 +51,26 @@ class UserProfile(models.Model):
     special_troops = models.JSONField(default=dict)
 
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        if not self.special_troops:
-            self.special_troops = PLAYER_CLASS_CHOICES[self.player_class]
-
     class Meta:
         unique_together = ('user', 'game_mode', 'display_name')  # Ensure each user can have only one profile per game mode with a unique display name
 
     def __str__(self):
         return f"{self.user.username} - {self.game_mode.name} - {self.display_name}"
 
+    # Defaults that depend on other fields are filled in when the profile is created, not in __init__, which also
+    # runs for every row loaded from the database.
+    def populate_defaults(self):
+        """
+        Special troops of the player's class, unless given. Call before bulk_create, save() calls it on creation.
+        """
+        if not self.special_troops:
+            self.special_troops = PLAYER_CLASS_CHOICES[self.player_class]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.populate_defaults()
+        super().save(*args, **kwargs)
+
 
 def generate_random_name():
     word_lists = [CELESTIAL_WORDS, ASTROPHYSICS_WORDS, GREEK_WORDS]
@@ -60,6 +79,77 @@ def generate_random_name():
 
 
 # Model for the planet(s):
+class GalaxySlots(models.Model):
+    """
+    Occupancy of a galaxy's planet slots, bit n - 1 of occupied set while planet_number n is taken. New planets take
+    the first free slot of the first galaxy with room, see allocate().
+    """
+    FULL = (1 << PLANETS_PER_GALAXY) - 1
+
+    galaxy = models.PositiveIntegerField(primary_key=True)
+    occupied = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def allocate(cls):
+        """
+        Takes the first free slot, in the caller's transaction. Galaxies locked by concurrent allocations are skipped
+        rather than waited for.
+        :return: (galaxy, planet_number)
+        """
+        return cls.allocate_many(1)[0]
+
+    @classmethod
+    def allocate_many(cls, count):
+        """
+        Takes the first count free slots like allocate(), with one lock query, one bulk UPDATE and, once every galaxy
+        is full, one bulk INSERT of new galaxies.
+
+        Galaxies locked by concurrent allocations count as full, so when all the galaxies with room are locked the
+        slots come from new galaxies and the locked ones keep theirs for later. Waiting for them instead could
+        deadlock, since the locks are held until the callers' transactions commit. At most one galaxy per
+        PLANETS_PER_GALAXY slots is opened per call, and later allocations fill the skipped slots first.
+        :return: [(galaxy, planet_number), ...]
+        """
+        while True:
+            with transaction.atomic():
+                # Every galaxy locked here has a free slot, so the first count of them are always enough
+                galaxies = list(cls.objects.select_for_update(skip_locked=True).filter(occupied__lt=cls.FULL)
+                                .order_by('galaxy')[:count])
+                new_galaxies = []
+                if sum(PLANETS_PER_GALAXY - bin(slots.occupied).count('1') for slots in galaxies) < count:
+                    last_galaxy = cls.objects.aggregate(models.Max('galaxy'))['galaxy__max'] or 0
+                    new_galaxies = [cls(galaxy=last_galaxy + 1 + n) for n in range(-(-count // PLANETS_PER_GALAXY))]
+
+                allocated = []
+                for slots in galaxies + new_galaxies:
+                    while len(allocated) < count and slots.occupied != cls.FULL:
+                        bit = ~slots.occupied & (slots.occupied + 1)
+                        slots.occupied |= bit
+                        allocated.append((slots.galaxy, bit.bit_length()))
+
+                new_galaxies = [slots for slots in new_galaxies if slots.occupied]
+                if new_galaxies:
+                    try:
+                        with transaction.atomic():
+                            cls.objects.bulk_create(new_galaxies)
+                    except IntegrityError:
+                        # Another allocation opened the same new galaxy first
+                        continue
+                cls.objects.bulk_update(galaxies, ['occupied'])
+                return allocated
+
+    @classmethod
+    def release(cls, galaxy, planet_number):
+        """
+        Frees the slot of a deleted planet.
+        """
+        free = cls.FULL ^ (1 << (planet_number - 1))
+        cls.objects.filter(galaxy=galaxy).update(occupied=F('occupied').bitand(free))
+
+    def __str__(self):
+        return f"Galaxy {self.galaxy}: {self.occupied:0{PLANETS_PER_GALAXY}b}"
+
+
 class Planet(models.Model):
     """
     can have multiple planets. also creates the planet's name
@@ -77,25 +167,44 @@ class Planet(models.Model):
     # Create a new id, defined in below overridden save() function.
     id = models.CharField(max_length=12, primary_key=True, default='', editable=False)
 
+    @staticmethod
+    def format_id(galaxy, planet_number):
+        return f"G{galaxy:02d}P{planet_number:02d}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        planet = super().from_db(db, field_names, values)
+        # The stored owner, which game_engine.signals compares with on save to tell if the planet changed hands
+        if 'owner_id' in planet.__dict__:
+            planet.loaded_owner_id = planet.owner_id
+        return planet
+
     def generate_new_id(self):
-        max_planet_number = Planet.objects.filter(galaxy=self.galaxy).aggregate(models.Max('planet_number'))[
-            'planet_number__max']
-        if max_planet_number is not None and max_planet_number >= 10:
-            self.galaxy += 1
-            self.planet_number = 1
-        else:
-            self.planet_number = (max_planet_number or 0) + 1
-        return f"G{self.galaxy:02d}P{self.planet_number:02d}"
+        self.galaxy, self.planet_number = GalaxySlots.allocate()
+        return self.format_id(self.galaxy, self.planet_number)
 
     def save(self, *args, **kwargs):
         if not self.id:  # object is being created
-            self.id = self.generate_new_id()
-        super().save(*args, **kwargs)
+            with transaction.atomic():
+                self.id = self.generate_new_id()
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return self.id
 
 
+class BuildingQuerySet(models.QuerySet):
+
+    def with_upgrade_level(self):
+        """
+        Annotates queued_upgrade_count, which upgrade_level (and so the dynamic_* costs) otherwise reads with a COUNT
+        query per building. Use it for every queryset whose buildings are serialized.
+        """
+        return self.annotate(queued_upgrade_count=models.Count('queued_upgrades'))
+
+
 # Model describing what a building or structure is:
 class Building(models.Model):
     """
@@ -109,39 +218,43 @@ class Building(models.Model):
     name = models.CharField(max_length=100, default='Default Building', editable=False)
     level = models.PositiveSmallIntegerField(default=1)
 
-    base_resource_costs = JSONField(default=dict)
-    upgrade_duration = models.DurationField(default=timedelta(seconds=5))
-
-    dynamic_resource_costs = JSONField(default=dict)
-    dynamic_upgrade_duration = models.DurationField(default=timedelta(seconds=5))
-
     arithmetic_population = models.PositiveSmallIntegerField(default=0)
     hp = models.PositiveSmallIntegerField(default=100)
 
-    # Add the upgrade_task_id and upgrade_start_time attributes
-    upgrade_task_id = models.CharField(max_length=255, null=True, blank=True)
-    upgrade_start_time = models.DateTimeField(null=True, blank=True)
+    objects = BuildingQuerySet.as_manager()
 
-    def initialize_base_resource_costs(self, building_type=None):
-        if building_type and building_type in BUILDING_COSTS:
-            costs = BUILDING_COSTS[building_type]
-            for resource_type, cost in costs.items():
-                self.base_resource_costs[resource_type] = cost
-        else:
-            for resource_type, _ in RESOURCE_CHOICES:
-                self.base_resource_costs[resource_type] = 100
+    # Upgrade costs and durations only depend on the building type and level, they are read from the level curve
+    # tables instead of being stored on every building.
+    @property
+    def level_curve(self):
+        return get_level_curve(type(self).__name__)
+
+    @property
+    def upgrade_level(self):
+        """
+        Level the building's next upgrade starts from: its level plus the upgrades already queued for it. Querysets can
+        annotate queued_upgrade_count=Count('queued_upgrades') to save the query.
+        """
+        queued = getattr(self, 'queued_upgrade_count', None)
+        if queued is None:
+            queued = self.queued_upgrade_count = self.queued_upgrades.count()
+        return self.level + queued
 
-    def __init__(self, *args, **kwargs):
-        building_type = kwargs.pop('building_type', None)
-        super().__init__(*args, **kwargs)
-        if not self.base_resource_costs:
-            self.initialize_base_resource_costs(building_type)
-        if not self.dynamic_resource_costs:
-            self.initialize_dynamic_resource_costs()
+    @property
+    def base_resource_costs(self):
+        return self.level_curve.cost(1)
 
-    def initialize_dynamic_resource_costs(self):
-        for resource_type in self.base_resource_costs:
-            self.dynamic_resource_costs[resource_type] = self.base_resource_costs[resource_type]
+    @property
+    def upgrade_duration(self):
+        return self.level_curve.duration(1)
+
+    @property
+    def dynamic_resource_costs(self):
+        return self.level_curve.cost(self.upgrade_level)
+
+    @property
+    def dynamic_upgrade_duration(self):
+        return self.level_curve.duration(self.upgrade_level)
 
     def __str__(self):
         return self.name
@@ -156,25 +269,115 @@ class Mine(Building):
     class Meta:
         unique_together = ('planet', 'resource_type')
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(building_type='Mine', *args, **kwargs)
+
+# Mines store their resource_type lower-cased, silos key stored_resources by the RESOURCE_CHOICES value.
+RESOURCE_NAMES = {resource_type.lower(): resource_type for resource_type, _ in RESOURCE_CHOICES}
+
+# Silo column holding each resource
+RESOURCE_FIELDS = {resource_type: resource_type.lower() for resource_type, _ in RESOURCE_CHOICES}
+
+# Bit of each resource column in Silo.full_resources
+RESOURCE_BITS = {field: 1 << index for index, field in enumerate(RESOURCE_FIELDS.values())}
+
+
+def accrual_expression(field, gained):
+    """
+    SQL expression adding gained to a silo resource column, capped at the silo's max_capacity. Amounts already above
+    the cap (e.g. after a refund) are never reduced.
+    """
+    return Greatest(F(field), Least(F(field) + gained, F('max_capacity')), output_field=models.PositiveIntegerField())
+
+
+def full_resources_expression(gains):
+    """
+    SQL expression of a silo row's full_resources bitmask once gains ({field: amount}) are added to its resource
+    columns.
+    """
+    bits = [Case(When(Q(**{f'{field}__gte': F('max_capacity') - gains.get(field, 0)}), then=Value(bit)),
+                 default=Value(0))
+            for field, bit in RESOURCE_BITS.items()]
+    return sum(bits[1:], bits[0])
+
+
+def producing_gains(production_rates, elapsed_seconds, full_resources):
+    """
+    Resources gained in elapsed_seconds ({field: amount}), leaving out the ones that are full in the full_resources
+    bitmask: production can't change them.
+    """
+    return {RESOURCE_FIELDS[resource_type]: rate * elapsed_seconds
+            for resource_type, rate in production_rates.items()
+            if rate and not full_resources & RESOURCE_BITS[RESOURCE_FIELDS[resource_type]]}
 
 
 class Silo(Building):
-    stored_resources = JSONField(default=dict)
+    boron = models.PositiveIntegerField(default=10000)
+    oxygen = models.PositiveIntegerField(default=10000)
+    uranium = models.PositiveIntegerField(default=10000)
+    helium = models.PositiveIntegerField(default=10000)
     max_capacity = models.PositiveIntegerField(default=20000)
     building_type = models.CharField(max_length=10, default='Silo')
     planet = models.OneToOneField(Planet, on_delete=models.CASCADE, related_name='silo')
+    # Production is accrued lazily: the resource columns are only correct as of this timestamp.
+    last_accrued_at = models.DateTimeField(default=timezone.now)
+    # Bitmask of the resources at max_capacity (RESOURCE_BITS). Production can't change those until a spend of them
+    # or a capacity upgrade clears their bit, so settling skips them, and the sweep skips the silos that are full
+    # on everything.
+    full_resources = models.PositiveSmallIntegerField(default=0, db_index=True)
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(building_type='Silo', *args, **kwargs)
-        if not self.stored_resources:
-            self.initialize_resource_storage()
+    ALL_FULL = sum(RESOURCE_BITS.values())
 
-    def initialize_resource_storage(self):
-        for resource_type, _ in RESOURCE_CHOICES:
-            if resource_type not in self.stored_resources:
-                self.stored_resources[resource_type] = 10000
+    @property
+    def stored_resources(self):
+        return {resource_type: getattr(self, field) for resource_type, field in RESOURCE_FIELDS.items()}
+
+    @stored_resources.setter
+    def stored_resources(self, amounts):
+        for resource_type, amount in amounts.items():
+            setattr(self, RESOURCE_FIELDS[resource_type], amount)
+
+    def production_rates(self):
+        """
+        Resources produced per second by the mines on this silo's planet, keyed like stored_resources.
+        """
+        rates = {}
+        mines = Mine.objects.filter(planet_id=self.planet_id).values_list('resource_type', 'production_rate_per_sec')
+        for resource_type, rate in mines:
+            resource_type = RESOURCE_NAMES.get(resource_type.lower(), resource_type)
+            rates[resource_type] = rates.get(resource_type, 0) + rate
+        return rates
+
+    def settle(self, now=None, attempts=3):
+        """
+        Accrue mine production since last_accrued_at into the resource columns with a single UPDATE, and reload them.
+        Only whole seconds are accrued, the remainder carries over to the next call. The UPDATE only applies if nobody
+        settled the silo in the meantime, otherwise it is retried from their state.
+        Call before reading or spending stored_resources.
+        """
+        for _ in range(attempts):
+            now = now or timezone.now()
+            elapsed_seconds = int((now - self.last_accrued_at).total_seconds())
+            if elapsed_seconds <= 0:
+                return
+
+            gains = producing_gains(self.production_rates(), elapsed_seconds, self.full_resources)
+            changes = {field: accrual_expression(field, gained) for field, gained in gains.items()}
+            settled = Silo.objects.filter(pk=self.pk, last_accrued_at=self.last_accrued_at,
+                                          full_resources=self.full_resources).update(
+                last_accrued_at=self.last_accrued_at + timedelta(seconds=elapsed_seconds),
+                full_resources=full_resources_expression(gains),
+                **changes)
+            self.reload_resources()
+            if settled:
+                return
+
+    def reload_resources(self):
+        """
+        Re-read the resource columns, last_accrued_at and full_resources in one query.
+        """
+        fields = [*RESOURCE_FIELDS.values(), 'last_accrued_at', 'full_resources']
+        values = Silo.objects.filter(pk=self.pk).values_list(*fields).get()
+        for field, value in zip(fields, values):
+            setattr(self, field, value)
 
 
 class Map(Building):
@@ -186,49 +389,68 @@ class Map(Building):
         return self.base_range * self.level
 
 
+def starting_troop_names(user_profile):
+    """
+    Basic troops, and special troops based on the player's class
+    """
+    return [troop_name for troop_name, _ in TROOP_CHOICES] + list(user_profile.special_troops)
+
+
 class Army(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     planet = models.OneToOneField(Planet, on_delete=models.CASCADE, related_name='army')
-    troops = JSONField(default=dict)
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        if not self.troops:
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        if is_new:
             self.initialize_troops()
 
     def initialize_troops(self):
         # Get the user profile for the current planet's owner
         user_profile = UserProfile.objects.get(user=self.planet.owner)
+        TroopCount.objects.bulk_create([TroopCount(army=self, troop_name=troop_name)
+                                        for troop_name in starting_troop_names(user_profile)])
 
-        # Initialize basic troops
-        for troop_name, _ in TROOP_CHOICES:
-            self.troops[troop_name] = {
-                'count': 0,
-                'in_construction': 0,
-            }
-
-        # Add special troops based on the player's class
-        for special_troop in user_profile.special_troops:
-            self.troops[special_troop] = {
-                'count': 0,
-                'in_construction': 0,
-            }
+    @property
+    def troops(self):
+        """
+        {troop_name: {'count': ..., 'in_construction': ...}}, read from the army's TroopCount rows. Change them with
+        game_engine.utilities_functions.troops rather than through this dict.
+        """
+        return {troop.troop_name: {'count': troop.count, 'in_construction': troop.in_construction}
+                for troop in self.troop_counts.all()}
 
     def __str__(self):
         return f"Army of planet {self.planet_id}"
 
 
+class ConstructionOrder(models.Model):
+    """
+    count units of troop_name ordered at an army's forge. A unit finishes every unit_time after started_at, delivered
+    of them have been moved into Army.troops so far and the next one is due at next_unit_at. The order is deleted once
+    all of them are delivered, see game_engine.background.troop_construction.
+    """
+    army = models.ForeignKey(Army, on_delete=models.CASCADE, related_name='construction_orders')
+    troop_name = models.CharField(max_length=50)
+    count = models.PositiveIntegerField()
+    delivered = models.PositiveIntegerField(default=0)
+    unit_time = models.DurationField()
+    started_at = models.DateTimeField(default=timezone.now)
+    next_unit_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.count} {self.troop_name} for army {self.army_id}"
+
+
 class Forge(Building):
     army = models.OneToOneField(Army, on_delete=models.CASCADE, related_name='forge', null=True, blank=True)
     planet = models.OneToOneField(Planet, on_delete=models.CASCADE, related_name='forge')
 
-    def __init__(self, *args, **kwargs):
-        kwargs['building_type'] = 'Forge'
-        super().__init__(*args, **kwargs)
-        self.name = 'Forge'
-
     def save(self, *args, **kwargs):
         is_new = not self.pk
+        if self._state.adding:
+            self.name = 'Forge'
         super().save(*args, **kwargs)
         if is_new:
             army = Army.objects.create(planet=self.planet)
@@ -243,35 +465,146 @@ class Fleet(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     planet = models.ForeignKey(Planet, on_delete=models.CASCADE, related_name='fleets')
-    troops = JSONField(default=dict)
+    # Summary of the troops, kept up to date by game_engine.utilities_functions.troops whenever they change. speed is
+    # the speed of the slowest troop present, 0 for an empty fleet.
+    unit_count = models.PositiveIntegerField(default=0, db_index=True)
+    attack_hp = models.PositiveBigIntegerField(default=0, db_index=True)
+    defense_hp = models.PositiveBigIntegerField(default=0, db_index=True)
+    cargo_space = models.PositiveBigIntegerField(default=0)
+    speed = models.PositiveIntegerField(default=0)
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        if not self.troops:
-            self.initialize_troops()
-
-    def initialize_troops(self):
-        for troop_name, _ in TROOP_CHOICES:
-            self.troops[troop_name] = 0
+    @property
+    def troops(self):
+        """
+        {troop_name: count}, read from the fleet's TroopCount rows. Change them with
+        game_engine.utilities_functions.troops rather than through this dict.
+        """
+        return {troop.troop_name: troop.count for troop in self.troop_counts.all()}
+
+    def count_vector(self):
+        """
+        The fleet's troops as a count vector over TROOP_NAMES, see game_engine.constants.troop_stats.
+        """
+        return count_vector(self.troops)
 
     def total_troops(self):
-        return sum(self.troops.values())
+        return int(self.count_vector().sum())
 
     def total_attack_hp(self):
-        return sum(
-            [self.troops[troop_name] * TROOPS_DATA[f"{troop_name}_units"]['attack_hp'] for troop_name in self.troops])
+        return int(stat_totals(self.count_vector(), 'attack_hp'))
 
     def total_defense_hp(self):
-        return sum(
-            [self.troops[troop_name] * TROOPS_DATA[f"{troop_name}_units"]['defense_hp'] for troop_name in self.troops])
+        return int(stat_totals(self.count_vector(), 'defense_hp'))
 
     def total_cargo_space(self):
-        return sum(
-            [self.troops[troop_name] * TROOPS_DATA[f"{troop_name}_units"]['cargo_space'] for troop_name in self.troops])
+        return int(stat_totals(self.count_vector(), 'cargo_space'))
 
     def max_travel_speed(self):
-        return min(
-            [TROOPS_DATA[f"{troop_name}_units"]['speed'] for troop_name in self.troops if self.troops[troop_name] > 0])
+        return int(max_travel_speeds(self.count_vector()))
 
     def __str__(self):
         return f"{self.name} on {self.planet_id}"
+
+
+class TroopCount(models.Model):
+    """
+    Units of one troop in an army, with the ones under construction at its forge, or in a fleet. Rows are changed
+    with single-row F() increments, see game_engine.utilities_functions.troops.
+    """
+    army = models.ForeignKey(Army, on_delete=models.CASCADE, null=True, blank=True, related_name='troop_counts')
+    fleet = models.ForeignKey(Fleet, on_delete=models.CASCADE, null=True, blank=True, related_name='troop_counts')
+    troop_name = models.CharField(max_length=50)
+    count = models.PositiveIntegerField(default=0)
+    in_construction = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['army', 'troop_name'], name='unique_army_troop'),
+            models.UniqueConstraint(fields=['fleet', 'troop_name'], name='unique_fleet_troop'),
+        ]
+
+    def __str__(self):
+        return f"{self.count} {self.troop_name}"
+
+
+class FleetMovement(models.Model):
+    """
+    A fleet in transit from its planet to a target planet. Arrived movements are claimed in batches and their
+    mission carried out by the process_fleet_arrivals task, see game_engine.background.fleet_movements. A movement
+    whose mission failed is kept with failed_at set and is not claimed again until failed_at is cleared.
+    """
+    ATTACK = 'attack'
+
+    MISSION_CHOICES = [
+        (ATTACK, 'Attack'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    fleet = models.OneToOneField(Fleet, on_delete=models.CASCADE, related_name='movement')
+    origin = models.ForeignKey(Planet, on_delete=models.CASCADE, related_name='outgoing_movements')
+    target = models.ForeignKey(Planet, on_delete=models.CASCADE, related_name='incoming_movements')
+    mission = models.CharField(max_length=32, choices=MISSION_CHOICES)
+    departed_at = models.DateTimeField()
+    arrives_at = models.DateTimeField(db_index=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['arrives_at']
+        indexes = [
+            models.Index(fields=['origin', 'arrives_at']),
+            models.Index(fields=['target', 'arrives_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.fleet_id} {self.mission} {self.target_id} at {self.arrives_at}"
+
+
+class UpgradeQueueEntry(models.Model):
+    """
+    A building upgrade queued on a planet. A planet's upgrades run one at a time in position order, each starting when
+    the one before it finishes, so starts_at and finishes_at are known when it is queued. The first entry is always
+    the upgrade in progress. The cost is taken from the silo when the upgrade is queued and kept in
+    reserved_resources for refunds.
+    Finished entries are applied by advance_upgrade_queue, driven by one GameEvent per planet that is due when the
+    first entry finishes, and called whenever the planet's buildings are read.
+    """
+    planet = models.ForeignKey(Planet, on_delete=models.CASCADE, related_name='upgrade_queue')
+    building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name='queued_upgrades')
+    building_type = models.CharField(max_length=10)
+    position = models.PositiveIntegerField()
+    reserved_resources = JSONField(default=dict)
+    duration = models.DurationField()
+    starts_at = models.DateTimeField()
+    finishes_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['planet', 'position']
+
+    def __str__(self):
+        return f"{self.building_type} upgrade #{self.position} on {self.planet_id}"
+
+
+class GameEvent(models.Model):
+    """
+    A timed game action (a planet's upgrade queue advancing) waiting for its due time.
+    Due events are applied in batches by the dispatch_due_events task, so in-flight actions are rows here rather than
+    delayed messages in the broker, and cancelling one is a row delete.
+    """
+    ADVANCE_UPGRADE_QUEUE = 'advance_upgrade_queue'
+
+    KIND_CHOICES = [
+        (ADVANCE_UPGRADE_QUEUE, 'Advance upgrade queue'),
+    ]
+
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    due_at = models.DateTimeField(db_index=True)
+    payload = JSONField(default=dict)
+    # The planet the event belongs to, if any, so a planet's events are found by index rather than by payload
+    planet = models.ForeignKey(Planet, on_delete=models.CASCADE, null=True, blank=True, related_name='events')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['due_at']
+
+    def __str__(self):
+        return f"{self.kind} due {self.due_at}"
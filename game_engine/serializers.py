@@ -2,7 +2,8 @@ from django.contrib.auth.models import User
 
 from users.serializers import UserSerializer
 from rest_framework import serializers
-from .models import Planet, Building, Mine, Silo, Fleet, Map, Forge, UserProfile, Army
+from .models import Planet, Building, Mine, Silo, Fleet, Map, Forge, UserProfile, Army, UpgradeQueueEntry, \
+    FleetMovement
 
 
 class PlanetIdSerializer(serializers.ModelSerializer):
@@ -54,7 +55,15 @@ class PlanetSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class BuildingSerializer(serializers.ModelSerializer):
+class BuildingCostsSerializer(serializers.Serializer):
+    # Read from the level curve tables, see Building
+    base_resource_costs = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+    upgrade_duration = serializers.DurationField(read_only=True)
+    dynamic_resource_costs = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+    dynamic_upgrade_duration = serializers.DurationField(read_only=True)
+
+
+class BuildingSerializer(BuildingCostsSerializer, serializers.ModelSerializer):
     class Meta:
         model = Building
         fields = '__all__'
@@ -71,25 +80,29 @@ class BuildingSerializer(serializers.ModelSerializer):
         return super().to_representation(instance)
 
 
-class MineSerializer(serializers.ModelSerializer):
+class MineSerializer(BuildingCostsSerializer, serializers.ModelSerializer):
     class Meta:
         model = Mine
         fields = '__all__'
 
 
-class SiloSerializer(serializers.ModelSerializer):
+class SiloSerializer(BuildingCostsSerializer, serializers.ModelSerializer):
+    # The resource columns are exposed as the stored_resources dict clients already use, the accrual bookkeeping
+    # columns are internal
+    stored_resources = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
     class Meta:
         model = Silo
-        fields = '__all__'
+        exclude = ('boron', 'oxygen', 'uranium', 'helium', 'last_accrued_at', 'full_resources')
 
 
-class MapSerializer(serializers.ModelSerializer):
+class MapSerializer(BuildingCostsSerializer, serializers.ModelSerializer):
     class Meta:
         model = Map
         fields = '__all__'
 
 
-class ForgeSerializer(serializers.ModelSerializer):
+class ForgeSerializer(BuildingCostsSerializer, serializers.ModelSerializer):
     class Meta:
         model = Forge
         fields = '__all__'
@@ -114,7 +127,7 @@ class UserProfileTroopsSerializer(serializers.ModelSerializer):
         fields = ("special_troops",)
 
 
-class ForgeWithTroopsSerializer(serializers.ModelSerializer):
+class ForgeWithTroopsSerializer(BuildingCostsSerializer, serializers.ModelSerializer):
     user_profile = UserProfileTroopsSerializer()
     troops = ArmySerializer(many=True, read_only=True)
 
@@ -126,14 +139,32 @@ class ForgeWithTroopsSerializer(serializers.ModelSerializer):
             "level",
             "upgrade_duration",
             "dynamic_upgrade_duration",
-            "upgrade_task_id",
-            "upgrade_start_time",
             "user_profile",
             "troops",
         )
 
 
+class UpgradeQueueEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UpgradeQueueEntry
+        fields = ('id', 'building', 'building_type', 'position', 'reserved_resources', 'duration', 'starts_at',
+                  'finishes_at')
+
+
 class FleetSerializer(serializers.ModelSerializer):
+    troops = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
     class Meta:
         model = Fleet
-        fields = ['id', 'name', 'planet', 'troops']
+        fields = ['id', 'name', 'planet', 'troops', 'unit_count', 'attack_hp', 'defense_hp', 'cargo_space', 'speed']
+        # Fleets are named by the views, "Fleet #01" and so on
+        read_only_fields = ['name', 'unit_count', 'attack_hp', 'defense_hp', 'cargo_space', 'speed']
+
+
+class FleetMovementSerializer(serializers.ModelSerializer):
+    fleet_name = serializers.CharField(source='fleet.name', read_only=True)
+
+    class Meta:
+        model = FleetMovement
+        fields = ('id', 'fleet', 'fleet_name', 'origin', 'target', 'mission', 'departed_at', 'arrives_at',
+                  'failed_at')
@@ -1,34 +1,55 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 
-from .constants.game_constrants import RESOURCE_CHOICES
-from .models import Planet, Mine, Silo, Forge, Map, UserProfile
+from .models import GalaxySlots, Planet, Map
+from .utilities_functions.map_data import invalidate_galaxy_tile, invalidate_map_viewer
+from .utilities_functions.onboarding import create_starting_worlds
 
 
 @receiver(post_save, sender=User)
 def create_initial_planet_and_buildings(sender, instance, created, **kwargs):
     if created:
-        # Create a new UserProfile for the user
-        UserProfile.objects.create(user=instance)
-
-        # Create a new planet for the user
-        planet = Planet(owner=instance)
-        planet.save()
-
-        # Create 4 Mines for each resource type
-        for resource_type, _ in RESOURCE_CHOICES:
-            mine = Mine(planet=planet, name=f'{resource_type.capitalize()} Mine', resource_type=resource_type.lower())
-            mine.save()
-
-        # Create a Silo
-        silo = Silo(planet=planet, name='Silo')
-        silo.save()
-
-        # Create a Forge
-        forge = Forge(planet=planet, name='Forge')
-        forge.save()
-
-        # Create a Map
-        map_instance = Map(planet=planet, name='Map')
-        map_instance.save()
+        # Profile, planet, mines, silo, forge with its army, and map, in bulk
+        create_starting_worlds([instance])
+
+
+@receiver(post_delete, sender=Planet)
+def release_planet_slot(sender, instance, **kwargs):
+    GalaxySlots.release(instance.galaxy, instance.planet_number)
+
+
+@receiver(pre_save, sender=Planet)
+def remember_previous_owner(sender, instance, update_fields=None, **kwargs):
+    # The owner the planet is saved over, whose visible map loses the planet if it changes hands. Planets loaded from
+    # the database know it already, only ones built by hand are looked up.
+    instance.previous_owner_id = None
+    if instance._state.adding or (update_fields is not None and 'owner' not in update_fields):
+        return
+    if hasattr(instance, 'loaded_owner_id'):
+        instance.previous_owner_id = instance.loaded_owner_id
+    else:
+        instance.previous_owner_id = Planet.objects.filter(pk=instance.pk).values_list('owner_id', flat=True).first()
+
+
+@receiver(post_save, sender=Planet)
+@receiver(post_delete, sender=Planet)
+def invalidate_galaxy_map(sender, instance, created=False, update_fields=None, **kwargs):
+    # Only a planet's slot, name and owner show on the map
+    if not created and update_fields and not {'name', 'owner'} & set(update_fields):
+        return
+    owner_ids = {instance.owner_id, getattr(instance, 'previous_owner_id', None)} - {None}
+    instance.loaded_owner_id = instance.owner_id
+    # After commit, so that a request in between cannot cache the old map again
+    transaction.on_commit(lambda: invalidate_galaxy_tile(instance.galaxy))
+    transaction.on_commit(lambda: [invalidate_map_viewer(owner_id) for owner_id in owner_ids])
+
+
+@receiver(post_save, sender=Map)
+def invalidate_map_range(sender, instance, **kwargs):
+    if Map.planet.is_cached(instance):
+        owner_id = instance.planet.owner_id
+    else:
+        owner_id = Planet.objects.filter(pk=instance.planet_id).values_list('owner_id', flat=True).first()
+    transaction.on_commit(lambda: invalidate_map_viewer(owner_id))
@@ -1,3 +1,666 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+# Test-only packages from requirements-dev.txt, lupa runs the ledger's Lua scripts in fakeredis
+try:
+    import fakeredis
+    import lupa  # noqa: F401
+except ImportError:
+    fakeredis = None
+
+from game_engine.constants.game_constrants import GALAXY_DISTANCE, PLANETS_PER_GALAXY, PLAYER_CLASS_CHOICES, \
+    RESOURCE_CHOICES
+from game_engine.background import fleet_movements
+from game_engine.background.tasks import settle_silos
+from game_engine.background.troop_construction import place_construction_order, settle_construction
+from game_engine.background.upgrade_queue import advance_upgrade_queue, cancel_queued_upgrade, enqueue_upgrade, \
+    move_queued_upgrade
+from game_engine.serializers import BuildingSerializer
+from game_engine.models import RESOURCE_BITS, Army, ConstructionOrder, Fleet, FleetMovement, Forge, GalaxySlots, \
+    GameEvent, Map, Mine, Planet, Silo, TroopCount, UpgradeQueueEntry, UserProfile, starting_troop_names
+from game_engine.utilities_functions.map_data import MAP_GALAXIES, generate_map_data, map_slots, map_viewer, \
+    visible_page_galaxies
+from game_engine.utilities_functions.onboarding import bulk_create_buildings, create_starting_worlds, \
+    starting_buildings
+from game_engine.utilities_functions.resource_ledger import DatabaseSiloLedger, RedisSiloLedger
+from game_engine.utilities_functions.troops import add_troops, fleet_count_matrix, troop_counts
+
+# A private cache for the tests that fill and clear it, so running them never touches the configured one
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'game_engine_tests'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class GenerateMapDataTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # The player's home planet, then two more in the next free slots
+        self.user = User.objects.create_user('player', 'player@example.com', 'password')
+        for _ in range(2):
+            Planet.objects.create(owner=self.user)
+
+    def test_galaxy_map_is_one_query(self):
+        with self.assertNumQueries(1):
+            map_data = generate_map_data(galaxy=1)
+
+        self.assertEqual(len(map_data), PLANETS_PER_GALAXY)
+        self.assertEqual([slot['owner_name'] for slot in map_data[:4]], ['player', 'player', 'player', None])
+        self.assertEqual([slot['occupied'] for slot in map_data[:4]], [True, True, True, False])
+
+    def test_query_count_does_not_grow_with_the_range(self):
+        with self.assertNumQueries(1):
+            map_data = generate_map_data()
+
+        self.assertEqual(len(map_data), MAP_GALAXIES * PLANETS_PER_GALAXY)
+
+    def test_range_limits_the_galaxies(self):
+        with self.assertNumQueries(1):
+            map_data = generate_map_data(map_range=1, origin=(1, 1))
+
+        self.assertEqual({slot['galaxy'] for slot in map_data}, {1, 2})
+        self.assertEqual(map_data[PLANETS_PER_GALAXY]['distance'], GALAXY_DISTANCE)
+
+    def test_cached_tiles_need_no_query(self):
+        generate_map_data(galaxy=1)
+        with self.assertNumQueries(0):
+            map_data = generate_map_data(galaxy=1)
+
+        self.assertEqual(map_data[0]['owner_name'], 'player')
+
+    def test_renaming_a_planet_invalidates_its_tile(self):
+        generate_map_data(galaxy=1)
+        planet = Planet.objects.get(galaxy=1, planet_number=2)
+        planet.name = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            planet.save(update_fields=['name'])
+
+        with self.assertNumQueries(1):
+            map_data = generate_map_data(galaxy=1)
+        self.assertEqual(map_data[1]['planet_name'], 'renamed')
+
+    def test_saving_a_loaded_planet_needs_no_owner_lookup(self):
+        planet = Planet.objects.get(galaxy=1, planet_number=2)
+        planet.name = 'renamed'
+        with self.assertNumQueries(1):
+            planet.save()
+
+    def test_saving_a_map_reads_only_its_owner(self):
+        map_building = Map.objects.get(planet__owner=self.user)
+        map_viewer(self.user)
+        map_building.base_range += 1
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            map_building.save()
+
+        self.assertEqual(sum('game_engine_planet' in query['sql'] for query in queries), 1)
+        self.assertEqual(map_viewer(self.user)['range'], map_building.range)
+
+    def test_changing_hands_invalidates_both_viewers(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        planet = Planet.objects.get(owner=other)
+        viewer = map_viewer(self.user)
+        self.assertIsNotNone(map_viewer(other))
+        planet.owner = self.user
+        with self.captureOnCommitCallbacks(execute=True):
+            planet.save()
+
+        with self.assertNumQueries(2):
+            self.assertEqual(map_viewer(self.user), viewer)
+            # other's only planet, and so its map, is gone
+            self.assertIsNone(map_viewer(other))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class VisibleMapPageTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Five full galaxies
+        self.user = User.objects.create_user('player', 'player@example.com', 'password')
+        for _ in range(5 * PLANETS_PER_GALAXY - 1):
+            Planet.objects.create(owner=self.user)
+
+    def test_only_galaxies_in_range_are_visible(self):
+        galaxies = visible_page_galaxies((3, 1), 1)['galaxies']
+        map_data = map_slots(galaxies, (3, 1))
+
+        self.assertEqual(galaxies, [2, 3, 4])
+        self.assertEqual(len(map_data), 3 * PLANETS_PER_GALAXY)
+        self.assertTrue(all(slot['occupied'] for slot in map_data))
+
+    def test_range_stops_at_the_last_galaxy(self):
+        self.assertEqual(visible_page_galaxies((5, 1), 10)['galaxies'], [1, 2, 3, 4, 5])
+
+    def test_galaxies_in_range_stay_visible_once_empty(self):
+        Planet.objects.filter(galaxy=4).delete()
+
+        self.assertEqual(visible_page_galaxies((5, 1), 1)['galaxies'], [4, 5])
+
+    def test_pages_split_the_galaxies(self):
+        # The last galaxy, then the planets of the page's galaxies
+        with self.assertNumQueries(2):
+            visible = visible_page_galaxies((1, 1), 10, page=2, per_page=2)
+            map_data = map_slots(visible['galaxies'], (1, 1))
+
+        self.assertEqual((visible['page'], visible['pages'], visible['galaxies']), (2, 3, [3, 4]))
+        self.assertEqual(len(map_data), 2 * PLANETS_PER_GALAXY)
+        self.assertEqual(visible_page_galaxies((1, 1), 10, page=4, per_page=2)['galaxies'], [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StartingWorldTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def create_users(self, count, prefix):
+        # bulk_create skips the signup signal
+        return User.objects.bulk_create([User(username=f'{prefix}{number}') for number in range(count)])
+
+    def test_signup_creates_the_starting_world(self):
+        user = User.objects.create_user('player', 'player@example.com', 'password')
+
+        planet = Planet.objects.get(owner=user)
+        self.assertEqual(planet.id, 'G01P01')
+        self.assertEqual(UserProfile.objects.get(user=user).display_name, 'player')
+        self.assertEqual(set(Mine.objects.filter(planet=planet).values_list('resource_type', flat=True)),
+                         {resource_type.lower() for resource_type, _ in RESOURCE_CHOICES})
+        self.assertEqual(Silo.objects.get(planet=planet).name, 'Silo')
+        self.assertEqual(Map.objects.get(planet=planet).range, 1)
+        forge = Forge.objects.get(planet=planet)
+        self.assertEqual(forge.army.planet_id, planet.id)
+        self.assertEqual(set(forge.army.troops), set(starting_troop_names(UserProfile.objects.get(user=user))))
+
+    def test_bulk_created_buildings_load_as_saved(self):
+        planet = Planet.objects.create(owner=self.create_users(1, 'player')[0])
+        buildings = starting_buildings(planet, Army.objects.bulk_create([Army(planet=planet)])[0])
+        # The Building rows, then one INSERT per subclass table
+        with self.assertNumQueries(5):
+            bulk_create_buildings(buildings)
+
+        for building in buildings:
+            loaded = type(building).objects.get(pk=building.pk)
+            self.assertEqual([getattr(loaded, field.attname) for field in type(building)._meta.concrete_fields],
+                             [getattr(building, field.attname) for field in type(building)._meta.concrete_fields])
+
+    def test_statements_do_not_grow_with_the_players(self):
+        User.objects.create_user('player', 'player@example.com', 'password')
+        # Both batches fill the last galaxy and open new ones
+        users = self.create_users(PLANETS_PER_GALAXY, 'first')
+        with CaptureQueriesContext(connection) as first_batch:
+            create_starting_worlds(users)
+
+        users = self.create_users(2 * PLANETS_PER_GALAXY, 'second')
+        with self.assertNumQueries(len(first_batch)):
+            planets = create_starting_worlds(users)
+
+        self.assertEqual(len({planet.id for planet in planets}), len(users))
+        self.assertEqual(Forge.objects.filter(planet__in=planets, army__isnull=False).count(), len(users))
+
+
+class ModelLoadingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('player', 'player@example.com', 'password')
+
+    def test_defaults_are_set_on_creation(self):
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.special_troops, PLAYER_CLASS_CHOICES[profile.player_class])
+        self.assertEqual(Forge.objects.get(planet__owner=self.user).name, 'Forge')
+
+    def test_loading_rows_keeps_stored_values(self):
+        UserProfile.objects.filter(user=self.user).update(special_troops=[])
+        with self.assertNumQueries(1):
+            profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.special_troops, [])
+
+
+@skipUnless(fakeredis, "fakeredis and lupa are not installed, see requirements-dev.txt")
+class RedisSiloLedgerTests(TestCase):
+
+    def setUp(self):
+        self.ledger = RedisSiloLedger(redis=fakeredis.FakeStrictRedis())
+        user = User.objects.create_user('player', 'player@example.com', 'password')
+        self.silo = Silo.objects.get(planet__owner=user)
+        # No production, so the balances only change by what the tests do
+        Mine.objects.filter(planet=self.silo.planet).update(production_rate_per_sec=0)
+
+    def test_spend_checks_and_decrements(self):
+        self.assertEqual(self.ledger.spend(self.silo, {'Boron': 4000, 'Helium': 1000}), (True, None))
+        self.assertEqual(self.ledger.spend(self.silo, {'Boron': 7000, 'Helium': 1000}), (False, 'Boron'))
+
+        balances = self.ledger.balances(self.silo)
+        self.assertEqual((balances['Boron'], balances['Helium']), (6000, 9000))
+        self.assertEqual(self.ledger.redis.smembers(self.ledger.dirty_key), {str(self.silo.pk).encode()})
+
+    def test_flush_writes_balances_back(self):
+        self.ledger.spend(self.silo, {'Oxygen': 2500})
+        self.ledger.credit(self.silo, {'Uranium': 500})
+        # Postgres only has them after the flush
+        self.assertEqual(Silo.objects.get(pk=self.silo.pk).oxygen, 10000)
+
+        self.assertEqual(self.ledger.flush(batch_size=10), 1)
+
+        silo = Silo.objects.get(pk=self.silo.pk)
+        self.assertEqual((silo.oxygen, silo.uranium), (7500, 10500))
+        self.assertFalse(self.ledger.redis.exists(self.ledger.dirty_key))
+        self.assertEqual(self.ledger.flush(batch_size=10), 0)
+
+    def test_rate_changes_apply_from_the_settled_time(self):
+        now = timezone.now()
+        Silo.objects.filter(pk=self.silo.pk).update(last_accrued_at=now - timedelta(seconds=100))
+        Mine.objects.filter(planet=self.silo.planet, resource_type='boron').update(production_rate_per_sec=1)
+
+        # The old rate up to the change 50 seconds ago, the new one since
+        self.ledger.settle(self.silo, until=now - timedelta(seconds=50))
+        Mine.objects.filter(planet=self.silo.planet, resource_type='boron').update(production_rate_per_sec=3)
+        self.ledger.reconfigure(self.silo)
+
+        self.assertAlmostEqual(self.ledger.balances(self.silo)['Boron'], 10000 + 50 + 3 * 50, delta=3)
+
+
+class FullResourcesTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('player', 'player@example.com', 'password')
+        self.silo = Silo.objects.get(planet__owner=user)
+
+    def age(self, seconds, **columns):
+        Silo.objects.filter(pk=self.silo.pk).update(
+            last_accrued_at=timezone.now() - timedelta(seconds=seconds), **columns)
+        self.silo.refresh_from_db()
+
+    def test_settle_marks_each_full_resource(self):
+        self.age(100, boron=19990, oxygen=20000)
+        self.silo.settle()
+
+        self.assertEqual(self.silo.full_resources, RESOURCE_BITS['boron'] | RESOURCE_BITS['oxygen'])
+        self.assertEqual((self.silo.boron, self.silo.uranium), (20000, 10100))
+
+    def test_sweep_skips_full_resources_and_full_silos(self):
+        # Full on oxygen, which must not be accrued again even though its column is behind
+        self.age(100, oxygen=15000, full_resources=RESOURCE_BITS['oxygen'])
+        self.assertEqual(settle_silos(Silo.objects.all(), chunk_size=10)['updated'], 1)
+        self.silo.refresh_from_db()
+        self.assertEqual((self.silo.oxygen, self.silo.boron), (15000, 10100))
+
+        self.age(100, full_resources=Silo.ALL_FULL)
+        self.assertEqual(settle_silos(Silo.objects.all(), chunk_size=10)['updated'], 0)
+
+    def test_sweep_leaves_planets_with_finished_upgrades(self):
+        self.age(100)
+        mine = Mine.objects.filter(planet=self.silo.planet).first()
+        finished = timezone.now() - timedelta(seconds=10)
+        UpgradeQueueEntry.objects.create(planet=self.silo.planet, building=mine, building_type='Mine', position=0,
+                                         reserved_resources={}, duration=timedelta(seconds=50),
+                                         starts_at=finished - timedelta(seconds=50), finishes_at=finished)
+
+        self.assertEqual(settle_silos(Silo.objects.all(), chunk_size=10)['silos'], 0)
+
+    def test_spending_clears_the_spent_resources(self):
+        self.age(0, boron=20000, helium=20000, full_resources=RESOURCE_BITS['boron'] | RESOURCE_BITS['helium'])
+        self.assertEqual(DatabaseSiloLedger().spend(self.silo, {'Boron': 100}), (True, None))
+
+        self.assertEqual(self.silo.full_resources, RESOURCE_BITS['helium'])
+
+
+class BuildingCostsTests(TestCase):
+
+    def test_serialized_costs_need_no_query_per_building(self):
+        User.objects.create_user('player', 'player@example.com', 'password')
+        User.objects.create_user('rival', 'rival@example.com', 'password')
+
+        mines = Mine.objects.with_upgrade_level()
+        with self.assertNumQueries(1):
+            data = BuildingSerializer(mines, many=True).data
+
+        self.assertEqual(len(data), 8)
+        self.assertTrue(all(mine['dynamic_resource_costs'] for mine in data))
+
+    def test_silo_payload_keeps_its_shape(self):
+        user = User.objects.create_user('player', 'player@example.com', 'password')
+
+        data = BuildingSerializer(Silo.objects.with_upgrade_level().get(planet__owner=user)).data
+
+        self.assertEqual(data['stored_resources'], {resource_type: 10000 for resource_type, _ in RESOURCE_CHOICES})
+        self.assertFalse({'boron', 'last_accrued_at', 'full_resources'} & set(data))
+
+
+class FleetCountMatrixTests(TestCase):
+
+    def test_ids_can_be_strings_or_uuids(self):
+        user = User.objects.create_user('player', 'player@example.com', 'password')
+        fleets = [Fleet.objects.create(planet=Planet.objects.get(owner=user), name=f'Fleet #{number}')
+                  for number in range(2)]
+        add_troops({'fleet_id': fleets[1].pk}, {'Infantry': 3})
+
+        counts = fleet_count_matrix([str(fleets[1].pk), fleets[0].pk])
+
+        self.assertEqual(counts.sum(axis=1).tolist(), [3, 0])
+
+
+class FleetMovementTests(TestCase):
+
+    def setUp(self):
+        self.attacker = Planet.objects.get(owner=User.objects.create_user('attacker', 'attacker@example.com', 'pw'))
+        self.defender = Planet.objects.get(owner=User.objects.create_user('defender', 'defender@example.com', 'pw'))
+        self.now = timezone.now()
+
+    def send(self, counts, travel_time=0):
+        fleet = Fleet.objects.create(planet=self.attacker, name='Fleet')
+        add_troops({'fleet_id': fleet.pk}, counts)
+        success, movement = fleet_movements.send_fleet(fleet, self.defender, FleetMovement.ATTACK, travel_time,
+                                                       now=self.now)
+        self.assertTrue(success)
+        return fleet
+
+    def test_a_fleet_in_transit_cannot_be_sent_again(self):
+        fleet = self.send({'Infantry': 1}, travel_time=60)
+
+        self.assertEqual(fleet_movements.send_fleet(fleet, self.defender, FleetMovement.ATTACK, 60),
+                         (False, "Fleet is already in transit"))
+
+    def test_failed_missions_keep_their_movements(self):
+        fleet = self.send({'Infantry': 1})
+
+        failing = mock.Mock(side_effect=ValueError)
+        with mock.patch.dict(fleet_movements.MISSION_HANDLERS, {FleetMovement.ATTACK: failing}), \
+                self.assertLogs(fleet_movements.logger):
+            self.assertEqual(fleet_movements.process_arrivals(10, now=self.now), 1)
+
+        self.assertEqual(FleetMovement.objects.get(fleet=fleet).failed_at, self.now)
+        self.assertEqual(fleet_movements.process_arrivals(10, now=self.now), 0)
+
+    def assertSummary(self, fleet, unit_count, attack_hp, defense_hp, cargo_space, speed):
+        fleet.refresh_from_db()
+        self.assertEqual((fleet.unit_count, fleet.attack_hp, fleet.defense_hp, fleet.cargo_space, fleet.speed),
+                         (unit_count, attack_hp, defense_hp, cargo_space, speed))
+        self.assertEqual(sum(troop_counts({'fleet_id': fleet.pk}).values()), unit_count)
+
+    def test_fleets_arriving_together_pool_their_attack(self):
+        # 1500 defense hp, more than either fleet's 1000 attack hp but not both
+        add_troops({'army__planet': self.defender}, {'Sentinels': 10})
+        fleets = [self.send({'Infantry': 10}), self.send({'Infantry': 10})]
+
+        self.assertEqual(fleet_movements.process_arrivals(10, now=self.now), 2)
+
+        self.assertFalse(FleetMovement.objects.exists())
+        self.assertEqual(troop_counts({'army__planet': self.defender}), {})
+        # Loss ratio (1500 / 2000) ** 1.5 = 0.65, 7 of 10 units lost per fleet
+        for fleet in fleets:
+            self.assertEqual(troop_counts({'fleet_id': fleet.pk}), {'Infantry': 3})
+            self.assertSummary(fleet, 3, 300, 75, 360, 9000)
+
+    def test_defender_wins(self):
+        add_troops({'army__planet': self.defender}, {'Sentinels': 10})
+        fleet = self.send({'Infantry': 5, 'Harvesters': 2})
+
+        fleet_movements.process_arrivals(10, now=self.now)
+
+        # Loss ratio (550 / 1500) ** 1.5 = 0.22, 3 of 10 units lost
+        self.assertEqual(troop_counts({'army__planet': self.defender}), {'Sentinels': 7})
+        self.assertEqual(troop_counts({'fleet_id': fleet.pk}), {})
+        self.assertSummary(fleet, 0, 0, 0, 0, 0)
+
+    def test_attacker_wins(self):
+        add_troops({'army__planet': self.defender}, {'Sentinels': 1})
+        fleet = self.send({'Infantry': 10, 'Harvesters': 4})
+
+        fleet_movements.process_arrivals(10, now=self.now)
+
+        # Loss ratio (150 / 1100) ** 1.5 = 0.05, rounded up to 1 unit of each troop
+        self.assertEqual(troop_counts({'army__planet': self.defender}), {})
+        self.assertEqual(troop_counts({'fleet_id': fleet.pk}), {'Infantry': 9, 'Harvesters': 3})
+        self.assertSummary(fleet, 12, 975, 285, 4080, 9000)
+
+
+class SimulateBattleViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('player', 'player@example.com', 'password'))
+
+    def simulate(self, attacker):
+        return self.client.post(reverse('simulate-battle'), {'attacker': attacker, 'defender': {'Sentinels': 1}},
+                                format='json')
+
+    def test_simulates_the_battle(self):
+        response = self.simulate({'Infantry': 10 ** 9})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['attacker_hp'], 100 * 10 ** 9)
+
+    def test_rejects_counts_that_are_not_small_ints(self):
+        for count in [True, 10 ** 9 + 1, 10 ** 17, 10 ** 20, -1, 1.5]:
+            with self.subTest(count=count):
+                self.assertEqual(self.simulate({'Infantry': count}).status_code, 400)
+
+
+class GalaxySlotsTests(TestCase):
+
+    def test_fills_the_first_galaxy_first(self):
+        self.assertEqual(GalaxySlots.allocate_many(3), [(1, 1), (1, 2), (1, 3)])
+        self.assertEqual(GalaxySlots.allocate(), (1, 4))
+
+    def test_released_slots_are_reused(self):
+        GalaxySlots.allocate_many(PLANETS_PER_GALAXY)
+        GalaxySlots.release(1, 3)
+
+        self.assertEqual(GalaxySlots.allocate(), (1, 3))
+
+    def test_opens_a_galaxy_once_every_galaxy_is_full(self):
+        GalaxySlots.allocate_many(PLANETS_PER_GALAXY)
+
+        self.assertEqual(GalaxySlots.allocate(), (2, 1))
+
+    def test_counts_span_galaxies(self):
+        GalaxySlots.allocate_many(PLANETS_PER_GALAXY - 2)
+        GalaxySlots.release(1, 1)
+
+        allocated = GalaxySlots.allocate_many(2 * PLANETS_PER_GALAXY + 1)
+
+        self.assertEqual(allocated[:4], [(1, 1), (1, PLANETS_PER_GALAXY - 1), (1, PLANETS_PER_GALAXY), (2, 1)])
+        self.assertEqual(allocated[-1], (3, PLANETS_PER_GALAXY - 2))
+        self.assertEqual(len(set(allocated)), len(allocated))
+        self.assertEqual(list(GalaxySlots.objects.values_list('galaxy', flat=True)), [1, 2, 3])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MapViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('player', 'player@example.com', 'password'))
+
+    def test_unchanged_maps_are_not_built(self):
+        response = self.client.get(reverse('visible_map'))
+        self.assertEqual(response.json()['map_data'][0]['owner_name'], 'player')
+
+        with mock.patch('core.views.galaxy_map.map_slots') as map_slots:
+            response = self.client.get(reverse('visible_map'), HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, 304)
+        map_slots.assert_not_called()
+
+    def test_galaxy_map_answers_a_matching_etag_with_not_modified(self):
+        url = reverse('galaxy_map', kwargs={'galaxy': 1})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['map_data'][0]['owner_name'], 'player')
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+
+class SeedPlayersTests(TestCase):
+
+    def test_numbers_continue_after_the_highest_taken(self):
+        User.objects.bulk_create([User(username=username) for username in ['load0', 'load7', 'loader', 'load2x']])
+
+        call_command('seed_players', 2, prefix='load', stdout=StringIO())
+
+        self.assertEqual(User.objects.filter(username__in=['load8', 'load9']).count(), 2)
+
+
+class UpgradeQueueTests(TestCase):
+
+    def setUp(self):
+        self.planet = Planet.objects.get(owner=User.objects.create_user('player', 'player@example.com', 'password'))
+        # No production, so the silo only changes by what the queue takes and refunds
+        Mine.objects.filter(planet=self.planet).update(production_rate_per_sec=0)
+        self.silo = Silo.objects.get(planet=self.planet)
+        self.map = Map.objects.get(planet=self.planet)
+        self.forge = Forge.objects.get(planet=self.planet)
+
+    def enqueue(self, building):
+        success, entry = enqueue_upgrade(self.planet, building, self.silo)
+        self.assertTrue(success)
+        return entry
+
+    def queue(self):
+        return list(UpgradeQueueEntry.objects.filter(planet=self.planet).order_by('position'))
+
+    def assertStored(self, amount):
+        self.assertEqual(set(Silo.objects.get(pk=self.silo.pk).stored_resources.values()), {amount})
+
+    def assertEventDue(self, due_at):
+        self.assertEqual(GameEvent.objects.get(kind=GameEvent.ADVANCE_UPGRADE_QUEUE, planet=self.planet).due_at, due_at)
+
+    def test_queued_upgrades_reserve_their_costs_and_run_one_after_another(self):
+        first, second, third = self.enqueue(self.map), self.enqueue(self.map), self.enqueue(self.forge)
+
+        # The second map upgrade is priced from the level the first one reaches
+        self.assertEqual([set(entry.reserved_resources.values()) for entry in [first, second, third]],
+                         [{100}, {200}, {100}])
+        self.assertStored(10000 - 400)
+        self.assertEqual([entry.duration for entry in [first, second, third]],
+                         [timedelta(seconds=5), timedelta(seconds=10), timedelta(seconds=5)])
+        self.assertEqual([second.starts_at, third.starts_at], [first.finishes_at, second.finishes_at])
+        self.assertEventDue(first.finishes_at)
+
+    def test_short_resources_queue_nothing(self):
+        Silo.objects.filter(pk=self.silo.pk).update(oxygen=50)
+
+        self.assertEqual(enqueue_upgrade(self.planet, self.map, self.silo), (False, 'Oxygen'))
+        self.assertEqual(self.queue(), [])
+        self.assertEqual(Silo.objects.get(pk=self.silo.pk).boron, 10000)
+
+    def test_moving_an_upgrade_reprojects_the_queue(self):
+        first, second, third = self.enqueue(self.map), self.enqueue(self.forge), self.enqueue(self.map)
+
+        self.assertEqual(move_queued_upgrade(third, 1), (True, "Upgrade moved"))
+
+        queue = self.queue()
+        self.assertEqual([entry.pk for entry in queue], [first.pk, third.pk, second.pk])
+        self.assertEqual([entry.position for entry in queue], [0, 1, 2])
+        self.assertEqual([queue[1].starts_at, queue[2].starts_at], [first.finishes_at, queue[1].finishes_at])
+        self.assertEqual(queue[2].finishes_at, first.finishes_at + timedelta(seconds=15))
+        self.assertEventDue(first.finishes_at)
+        self.assertEqual(move_queued_upgrade(first, 2), (False, "Upgrade already in progress"))
+
+    def test_cancelling_the_upgrade_in_progress_refunds_the_time_left(self):
+        first, second = self.enqueue(self.map), self.enqueue(self.forge)
+        now = first.starts_at + timedelta(seconds=2)
+
+        success, refunds = cancel_queued_upgrade(first, now=now)
+
+        # 3 of 5 seconds left
+        self.assertTrue(success)
+        self.assertEqual(set(refunds.values()), {60})
+        self.assertStored(10000 - 200 + 60)
+        queue = self.queue()
+        self.assertEqual([entry.pk for entry in queue], [second.pk])
+        self.assertEqual((queue[0].position, queue[0].starts_at, queue[0].finishes_at),
+                         (0, now, now + timedelta(seconds=5)))
+        self.assertEventDue(queue[0].finishes_at)
+
+    def test_cancelling_a_waiting_upgrade_refunds_everything(self):
+        first, second, third = self.enqueue(self.map), self.enqueue(self.forge), self.enqueue(self.map)
+
+        success, refunds = cancel_queued_upgrade(second, now=first.starts_at)
+
+        self.assertTrue(success)
+        self.assertEqual(set(refunds.values()), {100})
+        self.assertStored(10000 - 400 + 100)
+        queue = self.queue()
+        self.assertEqual([entry.pk for entry in queue], [first.pk, third.pk])
+        self.assertEqual(queue[1].starts_at, first.finishes_at)
+        self.assertEventDue(first.finishes_at)
+
+    def test_finished_upgrades_are_applied_in_order(self):
+        first, second = self.enqueue(self.map), self.enqueue(self.forge)
+
+        self.assertEqual(advance_upgrade_queue(self.planet.pk, first.finishes_at), 1)
+
+        self.assertEqual(Map.objects.get(pk=self.map.pk).level, self.map.level + 1)
+        self.assertEqual(Forge.objects.get(pk=self.forge.pk).level, self.forge.level)
+        self.assertEqual([entry.pk for entry in self.queue()], [second.pk])
+        self.assertEventDue(second.finishes_at)
+
+
+class TroopConstructionTests(TestCase):
+
+    def setUp(self):
+        planet = Planet.objects.get(owner=User.objects.create_user('player', 'player@example.com', 'password'))
+        Mine.objects.filter(planet=planet).update(production_rate_per_sec=0)
+        self.army = Army.objects.get(planet=planet)
+        self.silo = Silo.objects.get(planet=planet)
+        self.now = timezone.now()
+
+    def infantry(self):
+        infantry = TroopCount.objects.filter(army=self.army, troop_name='Infantry')
+        return infantry.values_list('count', 'in_construction').get()
+
+    def order(self, count):
+        success, orders = place_construction_order(self.army, self.silo, {'Infantry': count}, now=self.now)
+        self.assertTrue(success)
+        return orders[0]
+
+    def test_placing_an_order_charges_the_silo(self):
+        self.order(5)
+
+        silo = Silo.objects.get(pk=self.silo.pk)
+        self.assertEqual((silo.boron, silo.oxygen, silo.uranium), (10000 - 500, 10000 - 250, 10000 - 1500))
+        self.assertEqual(self.infantry(), (0, 5))
+
+    def test_finished_units_are_delivered_as_time_passes(self):
+        # An infantry unit takes 160 seconds
+        order = self.order(5)
+
+        self.assertEqual(settle_construction(self.army.pk, self.now + timedelta(seconds=400)), 2)
+
+        self.assertEqual(self.infantry(), (2, 3))
+        order.refresh_from_db()
+        self.assertEqual((order.delivered, order.next_unit_at), (2, self.now + timedelta(seconds=480)))
+        self.assertEqual(settle_construction(self.army.pk, self.now + timedelta(seconds=479)), 0)
+
+    def test_complete_orders_move_every_unit_into_the_army(self):
+        self.order(5)
+        settle_construction(self.army.pk, self.now + timedelta(seconds=400))
+
+        self.assertEqual(settle_construction(self.army.pk, self.now + timedelta(days=1)), 3)
+
+        self.assertEqual(self.infantry(), (5, 0))
+        self.assertFalse(ConstructionOrder.objects.filter(army=self.army).exists())
+
+    def test_short_resources_start_nothing(self):
+        Silo.objects.filter(pk=self.silo.pk).update(uranium=299)
+
+        self.assertEqual(place_construction_order(self.army, self.silo, {'Infantry': 1}, now=self.now),
+                         (False, "Not enough Uranium in the Silo."))
+        self.assertEqual(self.infantry(), (0, 0))
+        self.assertFalse(ConstructionOrder.objects.filter(army=self.army).exists())
+        self.assertEqual(Silo.objects.get(pk=self.silo.pk).boron, 10000)
@@ -0,0 +1,74 @@
+"""
+Combat rules, on count vectors and troop stats only (see game_engine.constants.troop_stats), no database access.
+
+The attackers' attack hp is matched against the defenders' defense hp and the side with more wins, ties go to the
+defender. The loser loses every unit, the winner a share of its units equal to the loss ratio,
+(loser hp / winner hp) ** 1.5, rounded up per troop.
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from game_engine.constants.troop_stats import stat_totals
+
+ATTACKER = 'attacker'
+DEFENDER = 'defender'
+
+# Distinct battles kept by simulate_battle_cached
+SIMULATION_CACHE_SIZE = 4096
+
+
+def battle_outcome(attacker_hp, defender_hp):
+    """
+    :return: (winner, loss_ratio), winner None if neither side has any hp
+    """
+    if not attacker_hp and not defender_hp:
+        return None, 0
+    if attacker_hp > defender_hp:
+        return ATTACKER, (defender_hp / attacker_hp) ** 1.5
+    return DEFENDER, (attacker_hp / defender_hp) ** 1.5
+
+
+def units_lost(count, loss_ratio):
+    return math.ceil(count * loss_ratio)
+
+
+def simulate_battle(attacker_counts, defender_counts):
+    """
+    Outcome of a battle between the attackers' and the defenders' count vectors.
+    :return: {'winner', 'loss_ratio', 'attacker_hp', 'defender_hp', 'attacker_losses', 'defender_losses'}, the
+             losses as count vectors
+    """
+    attacker_hp = int(stat_totals(attacker_counts, 'attack_hp'))
+    defender_hp = int(stat_totals(defender_counts, 'defense_hp'))
+    winner, loss_ratio = battle_outcome(attacker_hp, defender_hp)
+
+    attacker_losses = np.zeros_like(attacker_counts)
+    defender_losses = np.zeros_like(defender_counts)
+    if winner == ATTACKER:
+        attacker_losses = np.ceil(attacker_counts * loss_ratio).astype(np.int64)
+        defender_losses = defender_counts.copy()
+    elif winner == DEFENDER:
+        attacker_losses = attacker_counts.copy()
+        defender_losses = np.ceil(defender_counts * loss_ratio).astype(np.int64)
+
+    return {
+        'winner': winner,
+        'loss_ratio': loss_ratio,
+        'attacker_hp': attacker_hp,
+        'defender_hp': defender_hp,
+        'attacker_losses': attacker_losses,
+        'defender_losses': defender_losses,
+    }
+
+
+@lru_cache(maxsize=SIMULATION_CACHE_SIZE)
+def simulate_battle_cached(attacker_counts, defender_counts):
+    """
+    simulate_battle for count vectors given as tuples, memoized. The dict is shared, copy it before changing it.
+    """
+    outcome = simulate_battle(np.array(attacker_counts, dtype=np.int64), np.array(defender_counts, dtype=np.int64))
+    outcome['attacker_losses'] = tuple(int(count) for count in outcome['attacker_losses'])
+    outcome['defender_losses'] = tuple(int(count) for count in outcome['defender_losses'])
+    return outcome
@@ -1,34 +1,163 @@
-from game_engine.models import Planet
+"""
+Galaxy map data.
 
+Each galaxy's slots are a tile, built from the database once and kept in the cache (settings.CACHES) until a planet of
+the galaxy is created, renamed or changes owner (see game_engine.signals). Tiles carry an etag so that clients
+polling the map can be answered with 304 Not Modified. A player's map settings, their home slot and map range, are
+cached the same way until their Map or one of their planets is saved.
+"""
+import hashlib
+import json
+import math
 
-def generate_map_data(galaxy=None, range=None):
-    map_data = []
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
 
+from game_engine.constants.game_constrants import PLANETS_PER_GALAXY
+from game_engine.models import GalaxySlots, Map, Planet
+from game_engine.utilities_functions.travel import distance
+
+# Galaxies shown when no galaxy is asked for
+MAP_GALAXIES = 10
+# Galaxies per page of the visible map, see visible_page_galaxies
+VISIBLE_GALAXIES_PER_PAGE = 10
+
+
+def tile_key(galaxy):
+    return f'galaxy_map_tile:{galaxy}'
+
+
+def viewer_key(user_id):
+    return f'galaxy_map_viewer:{user_id}'
+
+
+def build_galaxy_tiles(galaxies):
+    """
+    Tiles of the galaxies, read with one query.
+    :return: {galaxy: {'etag': ..., 'slots': [...]}}
+    """
+    slots = {galaxy: [{
+        "galaxy": galaxy,
+        "planet_number": planet_number,
+        "planet_name": None,
+        "owner_name": None,
+        "occupied": False,
+    } for planet_number in range(1, PLANETS_PER_GALAXY + 1)] for galaxy in galaxies}
+
+    planets = Planet.objects.filter(galaxy__in=galaxies).select_related('owner') \
+        .only('galaxy', 'planet_number', 'name', 'owner__username')
+    for planet in planets:
+        if planet.planet_number > PLANETS_PER_GALAXY:
+            continue
+        slots[planet.galaxy][planet.planet_number - 1].update(planet_name=planet.name,
+                                                              owner_name=planet.owner.username, occupied=True)
+
+    return {galaxy: {'etag': hashlib.md5(json.dumps(galaxy_slots).encode()).hexdigest(), 'slots': galaxy_slots}
+            for galaxy, galaxy_slots in slots.items()}
+
+
+def galaxy_tiles(galaxies):
+    """
+    Tiles of the galaxies from the cache, the missing ones built with one query and cached.
+    :return: {galaxy: {'etag': ..., 'slots': [...]}}, shared with the cache's other readers, copy before changing
+    """
+    cached = cache.get_many([tile_key(galaxy) for galaxy in galaxies])
+    tiles = {galaxy: cached[tile_key(galaxy)] for galaxy in galaxies if tile_key(galaxy) in cached}
+    missing = [galaxy for galaxy in galaxies if galaxy not in tiles]
+    if missing:
+        built = build_galaxy_tiles(missing)
+        cache.set_many({tile_key(galaxy): tile for galaxy, tile in built.items()}, settings.GALAXY_MAP_CACHE_TIMEOUT)
+        tiles.update(built)
+    return tiles
+
+
+def invalidate_galaxy_tile(galaxy):
+    cache.delete(tile_key(galaxy))
+
+
+def map_viewer(user):
+    """
+    The player's home slot and map range, from their first planet and its Map.
+    :return: {'origin': (galaxy, planet_number), 'range': map_range}, or None for a player without a map
+    """
+    viewer = cache.get(viewer_key(user.pk))
+    if viewer is None:
+        map_building = Map.objects.filter(planet__owner=user).select_related('planet') \
+            .order_by('planet__galaxy', 'planet__planet_number').first()
+        if map_building is None:
+            return None
+        viewer = {'origin': (map_building.planet.galaxy, map_building.planet.planet_number),
+                  'range': map_building.range}
+        cache.set(viewer_key(user.pk), viewer, settings.GALAXY_MAP_CACHE_TIMEOUT)
+    return viewer
+
+
+def invalidate_map_viewer(user_id):
+    cache.delete(viewer_key(user_id))
+
+
+def map_galaxies(galaxy=None, map_range=None, origin=None):
+    """
+    Galaxies of the map: one galaxy, or the first MAP_GALAXIES, within map_range galaxies of origin.
+    """
     if galaxy is None:
-        galaxy_range = range(1, 11)  # Assuming 10 galaxies
+        first_galaxy, last_galaxy = 1, MAP_GALAXIES
     else:
-        galaxy_range = range(galaxy, galaxy + 1)
-
-    for galaxy in galaxy_range:
-        for planet_number in range(1, 11):  # Assuming 10 planets per galaxy
-            if range is None or abs(galaxy - range) <= range:
-                try:
-                    planet = Planet.objects.get(galaxy=galaxy, planet_number=planet_number)
-                    outpost_data = {
-                        "galaxy": galaxy,
-                        "planet_number": planet_number,
-                        "planet_name": planet.name,
-                        "owner_name": planet.owner.username,
-                        "occupied": True,
-                    }
-                except Planet.DoesNotExist:
-                    outpost_data = {
-                        "galaxy": galaxy,
-                        "planet_number": planet_number,
-                        "planet_name": None,
-                        "owner_name": None,
-                        "occupied": False,
-                    }
-                map_data.append(outpost_data)
-
-    return map_data
+        first_galaxy, last_galaxy = galaxy, galaxy
+    if map_range is not None and origin is not None:
+        first_galaxy, last_galaxy = max(first_galaxy, origin[0] - map_range), min(last_galaxy, origin[0] + map_range)
+    return list(range(first_galaxy, last_galaxy + 1))
+
+
+def map_etag(galaxies, map_range=None, origin=None):
+    """
+    ETag of the map generate_map_data returns for these arguments, changing whenever one of its tiles does.
+    """
+    tiles = galaxy_tiles(galaxies)
+    tag = '|'.join([tiles[galaxy]['etag'] for galaxy in galaxies] + [str(map_range), str(origin)])
+    return hashlib.md5(tag.encode()).hexdigest()
+
+
+def map_slots(galaxies, origin=None):
+    """
+    Slots of the galaxies, in order, with their distance from origin if given. Built from cached tiles, the missing
+    ones are read with one query.
+    """
+    if not galaxies:
+        return []
+
+    tiles = galaxy_tiles(galaxies)
+    return [{**slot, "distance": distance(origin, (slot["galaxy"], slot["planet_number"])) if origin else None}
+            for galaxy in galaxies for slot in tiles[galaxy]['slots']]
+
+
+def generate_map_data(galaxy=None, map_range=None, origin=None):
+    """
+    Slots of one galaxy, or of the first MAP_GALAXIES, within map_range galaxies of origin, a (galaxy, planet_number)
+    slot. With an origin each slot also has its distance from it.
+    """
+    return map_slots(map_galaxies(galaxy, map_range, origin), origin)
+
+
+def visible_galaxies(origin, map_range):
+    """
+    Galaxies visible from the origin slot: those within map_range galaxies of it, up to the last galaxy opened so
+    far. Galaxies in range are included whether or not any planet is left in them.
+    """
+    last_galaxy = GalaxySlots.objects.aggregate(Max('galaxy'))['galaxy__max'] or origin[0]
+    return range(max(1, origin[0] - map_range), min(last_galaxy, origin[0] + map_range) + 1)
+
+
+def visible_page_galaxies(origin, map_range, page=1, per_page=VISIBLE_GALAXIES_PER_PAGE):
+    """
+    The galaxies on one page of the map visible from origin with map_range, per_page galaxies to a page, without
+    reading any slot.
+    :return: {'page', 'pages', 'galaxies'}
+    """
+    galaxies = visible_galaxies(origin, map_range)
+    return {
+        'page': page,
+        'pages': max(1, math.ceil(len(galaxies) / per_page)),
+        'galaxies': list(galaxies[(page - 1) * per_page:page * per_page]),
+    }
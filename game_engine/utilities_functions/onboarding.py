@@ -0,0 +1,90 @@
+"""
+Starting worlds of new players.
+
+A player starts with a profile, a planet, one Mine per resource type, a Silo, a Forge with its Army and the army's
+TroopCount rows, and a Map. create_starting_worlds creates them for any number of users with one bulk INSERT per
+table, so one signup and a batch of thousands of seeded players take the same handful of statements.
+"""
+from django.db import connections, router, transaction
+
+from game_engine.constants.game_constrants import RESOURCE_CHOICES
+from game_engine.models import Army, Building, Forge, GalaxySlots, Map, Mine, Planet, Silo, TroopCount, UserProfile, \
+    default_game_mode, starting_troop_names
+from game_engine.utilities_functions.map_data import invalidate_galaxy_tile
+
+
+def bulk_create_buildings(buildings):
+    """
+    bulk_create for Building subclasses, which Django refuses for multi-table inheritance: one bulk INSERT of the
+    Building rows, then one multi-row INSERT per batch of each subclass table. Skips save() and its signals like
+    bulk_create.
+    """
+    db = router.db_for_write(Building)
+    connection = connections[db]
+    Building.objects.using(db).bulk_create([
+        Building(**{field.attname: getattr(building, field.attname) for field in Building._meta.concrete_fields})
+        for building in buildings
+    ])
+
+    by_model = {}
+    for building in buildings:
+        building.building_ptr_id = building.id
+        by_model.setdefault(type(building), []).append(building)
+    for model, objs in by_model.items():
+        fields = model._meta.local_concrete_fields
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        row = f"({', '.join(['%s'] * len(fields))})"
+        batch_size = connection.ops.bulk_batch_size(fields, objs)
+        with connection.cursor() as cursor:
+            for start in range(0, len(objs), batch_size):
+                batch = objs[start:start + batch_size]
+                cursor.execute(f"INSERT INTO {table} ({columns}) VALUES {', '.join([row] * len(batch))}",
+                               [field.get_db_prep_save(field.pre_save(obj, True), connection)
+                                for obj in batch for field in fields])
+        for obj in objs:
+            obj._state.adding = False
+            obj._state.db = db
+
+
+def starting_buildings(planet, army):
+    """
+    The buildings every new planet starts with, unsaved.
+    """
+    buildings = [Mine(planet=planet, name=f'{resource_type.capitalize()} Mine', resource_type=resource_type.lower())
+                 for resource_type, _ in RESOURCE_CHOICES]
+    buildings += [Silo(planet=planet, name='Silo'), Forge(planet=planet, name='Forge', army=army),
+                  Map(planet=planet, name='Map')]
+    return buildings
+
+
+def create_starting_worlds(users):
+    """
+    Creates the profile and home planet, with its buildings, army and troops, of each of the users in one transaction.
+    Nothing is saved one by one, so no post_save signals fire for the new rows.
+    :return: the new planets, in the order of users
+    """
+    users = list(users)
+    with transaction.atomic():
+        game_mode_id = default_game_mode()
+        profiles = [UserProfile(user=user, game_mode_id=game_mode_id, display_name=user.username) for user in users]
+        for profile in profiles:
+            profile.populate_defaults()
+        UserProfile.objects.bulk_create(profiles)
+
+        planets = [Planet(id=Planet.format_id(galaxy, planet_number), galaxy=galaxy, planet_number=planet_number,
+                          owner=user)
+                   for user, (galaxy, planet_number) in zip(users, GalaxySlots.allocate_many(len(users)))]
+        Planet.objects.bulk_create(planets)
+
+        armies = Army.objects.bulk_create([Army(planet=planet) for planet in planets])
+        TroopCount.objects.bulk_create([TroopCount(army=army, troop_name=troop_name)
+                                        for army, profile in zip(armies, profiles)
+                                        for troop_name in starting_troop_names(profile)])
+
+        bulk_create_buildings([building for planet, army in zip(planets, armies)
+                               for building in starting_buildings(planet, army)])
+
+        galaxies = {planet.galaxy for planet in planets}
+        transaction.on_commit(lambda: [invalidate_galaxy_tile(galaxy) for galaxy in galaxies])
+    return planets
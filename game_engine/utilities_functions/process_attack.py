@@ -2,41 +2,59 @@ import math
 from celery import shared_task
 from celery.loaders import app
 from django.core.exceptions import ObjectDoesNotExist
-from game_engine.models import Planet, Mine, Silo, Army, Fleet, Forge, Map
+from django.db import transaction
+from django.db.models import Q
+from game_engine.models import Planet, Mine, Silo, Army, Fleet, Forge, Map, TroopCount
 from decimal import Decimal
 
+from game_engine.background.troop_construction import settle_construction
+from game_engine.constants.troop_stats import troop_stat
+from game_engine.utilities_functions.combat import ATTACKER, battle_outcome, units_lost
+from game_engine.utilities_functions.troops import refresh_fleet_summaries
 
-@shared_task(bind=True)
-def process_attack(attacker_fleet_id, defender_planet_id):
-    attacker_fleet = Fleet.objects.get(id=attacker_fleet_id)
-    defender_planet = Planet.objects.get(id=defender_planet_id)
-    defender_forge = Forge.objects.get(planet_id=defender_planet_id)
-    defender_army = Army.objects.get(planet_id=defender_planet_id)
 
-    attacker_hp = sum(troop['attack_hp'] * count for troop, count in attacker_fleet.troops.items())
-    defender_hp = sum(troop['defense_hp'] * count for troop, count in defender_army.troops.items())
-
-    if attacker_hp > defender_hp:
-        winner = "attacker"
-        loser = "defender"
-    else:
-        winner = "defender"
-        loser = "attacker"
-
-    loss_ratio = (attacker_hp / defender_hp) ** 1.5
-
-    if winner == "attacker":
-        # Remove a percentage of attacker's units equal to the loss ratio
-        for troop in attacker_fleet.troops:
-            attacker_fleet.troops[troop] = math.floor(attacker_fleet.troops[troop] * (1 - loss_ratio))
-            defender_army.troops[troop] = 0
-    else:
-        # Remove a percentage of defender's units equal to the loss ratio
-        for troop in defender_army.troops:
-            defender_army.troops[troop] = math.floor(defender_army.troops[troop] * (1 - loss_ratio))
-            attacker_fleet.troops[troop] = 0
+def resolve_attacks(defender_planet_id, attacker_fleet_ids):
+    """
+    Resolves the attacks of fleets arriving at a planet together as one battle under the rules in
+    game_engine.utilities_functions.combat, their attack hp pooled against the defending army's defense hp. The troops
+    of every side are read and locked with one query and written back with one bulk update.
+    """
+    defender_army = Army.objects.get(planet_id=defender_planet_id)
+    # Units finished before the attack landed defend too
+    settle_construction(defender_army.pk)
+
+    with transaction.atomic():
+        troops = list(TroopCount.objects.select_for_update()
+                      .filter(Q(army_id=defender_army.pk) | Q(fleet_id__in=attacker_fleet_ids), count__gt=0))
+        attacker_troops = [troop for troop in troops if troop.fleet_id]
+        defender_troops = [troop for troop in troops if troop.army_id]
+
+        attacker_hp = sum(troop.count * troop_stat(troop.troop_name, 'attack_hp') for troop in attacker_troops)
+        defender_hp = sum(troop.count * troop_stat(troop.troop_name, 'defense_hp') for troop in defender_troops)
+        winner, loss_ratio = battle_outcome(attacker_hp, defender_hp)
+        if winner is None:
+            return
+
+        if winner == ATTACKER:
+            winners, losers = attacker_troops, defender_troops
+        else:
+            winners, losers = defender_troops, attacker_troops
+
+        # The winners lose a share of their units equal to the loss ratio, the losers everything
+        for troop in winners:
+            troop.count -= units_lost(troop.count, loss_ratio)
+        for troop in losers:
+            troop.count = 0
+        TroopCount.objects.bulk_update(troops, ['count'])
+        refresh_fleet_summaries(attacker_fleet_ids)
 
     # TODO : Add attacker points and raider points
 
-    attacker_fleet.save()
-    defender_army.save()
+
+def resolve_attack(attacker_fleet_id, defender_planet_id):
+    resolve_attacks(defender_planet_id, [attacker_fleet_id])
+
+
+@shared_task(bind=True)
+def process_attack(self, attacker_fleet_id, defender_planet_id):
+    resolve_attack(attacker_fleet_id, defender_planet_id)
@@ -0,0 +1,308 @@
+"""
+Silo resource ledger.
+
+Every read, spend and refund of silo resources goes through the ledger returned by get_silo_ledger(), selected by
+settings.SILO_LEDGER:
+
+'database'  The Silo resource columns are the source of truth. Production is accrued, and resources spent, with
+            conditional UPDATEs of F() expressions, e.g. boron = boron - cost WHERE boron >= cost.
+'redis'     Balances live in a Redis hash per silo (in the Redis of settings.CACHES['silo_ledger']). Spends are a single
+            Lua script that accrues production, checks and decrements atomically. Changed silos are marked dirty and
+            written back to Postgres in batches by flush_silo_ledger (write-behind), which is then the only writer of
+            the Silo resource columns.
+"""
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import F
+
+from game_engine.constants.game_constrants import RESOURCE_CHOICES
+from game_engine.models import Silo, RESOURCE_BITS, RESOURCE_FIELDS
+
+RESOURCE_TYPES = [resource_type for resource_type, _ in RESOURCE_CHOICES]
+
+
+class DatabaseSiloLedger:
+    # Spends roll back with the surrounding transaction
+    transactional = True
+
+    def balances(self, silo):
+        silo.settle()
+        return silo.stored_resources
+
+    def spend(self, silo, costs, attempts=3):
+        """
+        Deducts costs from the silo if every resource is available, in one conditional UPDATE. Retried up to attempts
+        times while no resource reads short but the UPDATE still missed, e.g. after a concurrent refund.
+        :return: (True, None) on success, (False, resource_type) for the first resource that is short
+        """
+        available = {f'{RESOURCE_FIELDS[resource_type]}__gte': cost for resource_type, cost in costs.items()}
+        deductions = {RESOURCE_FIELDS[resource_type]: F(RESOURCE_FIELDS[resource_type]) - cost
+                      for resource_type, cost in costs.items()}
+        # The spent resources are no longer full
+        not_full = Silo.ALL_FULL ^ sum(RESOURCE_BITS[RESOURCE_FIELDS[resource_type]] for resource_type in costs)
+        for _ in range(attempts):
+            silo.settle()
+            spent = Silo.objects.filter(pk=silo.pk, **available).update(
+                full_resources=F('full_resources').bitand(not_full), **deductions)
+
+            silo.reload_resources()
+            if spent:
+                return True, None
+            for resource_type, cost in costs.items():
+                if silo.stored_resources[resource_type] < cost:
+                    return False, resource_type
+        # Still contended, report the first resource
+        return False, next(iter(costs))
+
+    def credit(self, silo, amounts):
+        silo.settle()
+        Silo.objects.filter(pk=silo.pk).update(**{
+            RESOURCE_FIELDS[resource_type]: F(RESOURCE_FIELDS[resource_type]) + amount
+            for resource_type, amount in amounts.items()
+        })
+        silo.reload_resources()
+
+    def settle(self, silo, until=None):
+        """
+        Accrues production under the current mine rates and capacity, up to until (default now). Call before changing
+        either.
+        """
+        silo.settle(now=until)
+
+    def reconfigure(self, silo):
+        """
+        Picks up new mine rates or capacity. Call after changing either.
+        """
+
+
+# Shared by all scripts: accrue whole seconds of production since 'ts' at the stored rates, capped at 'cap', up to
+# until (default, and at most, the Redis time).
+ACCRUE_LUA = """
+local resources = {%s}
+local function accrue(key, up_to)
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    if up_to and up_to < now then
+        now = up_to
+    end
+    local ts = tonumber(redis.call('HGET', key, 'ts'))
+    local elapsed = math.floor(now - ts)
+    if elapsed <= 0 then
+        return
+    end
+    local cap = tonumber(redis.call('HGET', key, 'cap'))
+    for _, resource in ipairs(resources) do
+        local rate = tonumber(redis.call('HGET', key, 'rate:' .. resource) or '0')
+        if rate > 0 then
+            local current = tonumber(redis.call('HGET', key, resource) or '0')
+            local accrued = math.max(current, math.min(current + rate * elapsed, cap))
+            redis.call('HSET', key, resource, string.format('%%d', accrued))
+        end
+    end
+    redis.call('HSET', key, 'ts', string.format('%%.6f', ts + elapsed))
+end
+""" % ', '.join(f"'{resource_type}'" for resource_type in RESOURCE_TYPES)
+
+# KEYS: silo hash. ARGV: field, value pairs. Loads a silo unless another request already did.
+HYDRATE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+# KEYS: silo hash, dirty set. ARGV: silo id, then resource, cost pairs.
+# Returns 'MISSING' if the silo is not loaded, the short resource if one is, 'OK' after deducting.
+SPEND_LUA = ACCRUE_LUA + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 'MISSING'
+end
+accrue(KEYS[1])
+for i = 2, #ARGV, 2 do
+    if tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0') < tonumber(ARGV[i + 1]) then
+        return ARGV[i]
+    end
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], -tonumber(ARGV[i + 1]))
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+return 'OK'
+"""
+
+# KEYS: silo hash, dirty set. ARGV: silo id, then resource, amount pairs.
+CREDIT_LUA = ACCRUE_LUA + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 'MISSING'
+end
+accrue(KEYS[1])
+for i = 2, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], tonumber(ARGV[i + 1]))
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+return 'OK'
+"""
+
+# KEYS: silo hash. Returns the accrued hash, or an empty list if the silo is not loaded.
+BALANCES_LUA = ACCRUE_LUA + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {}
+end
+accrue(KEYS[1])
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# KEYS: silo hash, dirty set. ARGV: silo id, until timestamp.
+SETTLE_LUA = ACCRUE_LUA + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 'MISSING'
+end
+accrue(KEYS[1], tonumber(ARGV[2]))
+redis.call('SADD', KEYS[2], ARGV[1])
+return 'OK'
+"""
+
+# KEYS: silo hash, dirty set. ARGV: silo id, then field, value pairs for the new rates and capacity. The new rates
+# apply from 'ts', the caller settles up to the change first.
+RECONFIGURE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('SADD', KEYS[2], ARGV[1])
+return 1
+"""
+
+
+class RedisSiloLedger:
+    # Spends are applied in Redis right away, a rolled back transaction has to credit them back
+    transactional = False
+    key_prefix = 'silo_ledger:'
+    dirty_key = 'silo_ledger:dirty'
+
+    def __init__(self, redis=None):
+        if redis is None:
+            from django_redis import get_redis_connection
+
+            redis = get_redis_connection('silo_ledger')
+        self.redis = redis
+        self.hydrate_script = self.redis.register_script(HYDRATE_LUA)
+        self.spend_script = self.redis.register_script(SPEND_LUA)
+        self.credit_script = self.redis.register_script(CREDIT_LUA)
+        self.balances_script = self.redis.register_script(BALANCES_LUA)
+        self.settle_script = self.redis.register_script(SETTLE_LUA)
+        self.reconfigure_script = self.redis.register_script(RECONFIGURE_LUA)
+
+    def key(self, silo_id):
+        return f'{self.key_prefix}{silo_id}'
+
+    def configuration(self, silo):
+        fields = ['cap', silo.max_capacity]
+        production_rates = silo.production_rates()
+        for resource_type in RESOURCE_TYPES:
+            fields += [f'rate:{resource_type}', production_rates.get(resource_type, 0)]
+        return fields
+
+    def hydrate(self, silo):
+        """
+        Loads the silo from Postgres into Redis, if it is not there yet.
+        """
+        silo = Silo.objects.get(pk=silo.pk)
+        fields = ['ts', f'{silo.last_accrued_at.timestamp():.6f}'] + self.configuration(silo)
+        for resource_type in RESOURCE_TYPES:
+            fields += [resource_type, int(silo.stored_resources.get(resource_type, 0))]
+        self.hydrate_script(keys=[self.key(silo.pk)], args=fields)
+
+    def run(self, script, silo, pairs):
+        keys = [self.key(silo.pk), self.dirty_key]
+        args = [str(silo.pk)]
+        for resource_type, amount in pairs.items():
+            args += [resource_type, int(amount)]
+
+        result = script(keys=keys, args=args)
+        if result == b'MISSING':
+            self.hydrate(silo)
+            result = script(keys=keys, args=args)
+        return result.decode()
+
+    def balances(self, silo):
+        result = self.balances_script(keys=[self.key(silo.pk)])
+        if not result:
+            self.hydrate(silo)
+            result = self.balances_script(keys=[self.key(silo.pk)])
+
+        fields = dict(zip(result[::2], result[1::2]))
+        silo.stored_resources = {resource_type: int(fields[resource_type.encode()])
+                                 for resource_type in RESOURCE_TYPES}
+        return silo.stored_resources
+
+    def spend(self, silo, costs):
+        result = self.run(self.spend_script, silo, costs)
+        if result != 'OK':
+            return False, result
+        return True, None
+
+    def credit(self, silo, amounts):
+        self.run(self.credit_script, silo, amounts)
+
+    def settle(self, silo, until=None):
+        # Accrues under the current rates up to until (default now), before reconfigure() changes them
+        keys = [self.key(silo.pk), self.dirty_key]
+        args = [str(silo.pk), f'{until.timestamp():.6f}' if until else '']
+        if self.settle_script(keys=keys, args=args) == b'MISSING':
+            self.hydrate(silo)
+            self.settle_script(keys=keys, args=args)
+
+    def reconfigure(self, silo):
+        silo = Silo.objects.get(pk=silo.pk)
+        self.reconfigure_script(keys=[self.key(silo.pk), self.dirty_key],
+                                args=[str(silo.pk)] + self.configuration(silo))
+
+    def flush(self, batch_size):
+        """
+        Writes the balances of dirty silos back to Postgres, batch_size silos per bulk UPDATE.
+        :return: the number of silos written
+        """
+        flushed = 0
+        while True:
+            silo_ids = [silo_id.decode() for silo_id in self.redis.spop(self.dirty_key, batch_size) or []]
+            if not silo_ids:
+                return flushed
+
+            pipeline = self.redis.pipeline(transaction=False)
+            for silo_id in silo_ids:
+                pipeline.hgetall(self.key(silo_id))
+            snapshots = dict(zip(silo_ids, pipeline.execute()))
+
+            try:
+                silos = list(Silo.objects.filter(pk__in=silo_ids))
+                for silo in silos:
+                    snapshot = snapshots[str(silo.pk)]
+                    if not snapshot:
+                        continue
+                    silo.stored_resources = {resource_type: int(snapshot[resource_type.encode()])
+                                             for resource_type in RESOURCE_TYPES}
+                    silo.last_accrued_at = datetime.fromtimestamp(float(snapshot[b'ts']), tz=timezone.utc)
+                    silo.full_resources = sum(bit for field, bit in RESOURCE_BITS.items()
+                                              if getattr(silo, field) >= silo.max_capacity)
+                Silo.objects.bulk_update(silos, [*RESOURCE_FIELDS.values(), 'last_accrued_at', 'full_resources'])
+            except Exception:
+                # Put them back so the next flush retries
+                self.redis.sadd(self.dirty_key, *silo_ids)
+                raise
+            flushed += len(silos)
+
+
+_ledger = None
+
+
+def get_silo_ledger():
+    global _ledger
+    if _ledger is None:
+        if settings.SILO_LEDGER == 'redis':
+            _ledger = RedisSiloLedger()
+        else:
+            _ledger = DatabaseSiloLedger()
+    return _ledger
@@ -0,0 +1,79 @@
+"""
+Distances and travel times between planets.
+
+A planet's coordinates are its (galaxy, planet_number) slot, also spelled out in its id ("G01P02"). Planets of one
+galaxy are PLANET_DISTANCE apart per slot, galaxies GALAXY_DISTANCE apart regardless of the slots. A fleet moves at
+its speed (its slowest troop's, in distance per hour). Distances and travel times also come as NumPy versions taking
+arrays, for the fleets of a whole empire at once.
+"""
+import re
+
+import numpy as np
+
+from game_engine.constants.game_constrants import GALAXY_DISTANCE, PLANET_DISTANCE
+
+PLANET_ID_PATTERN = re.compile(r'G(\d+)P(\d+)')
+SECONDS_PER_HOUR = 3600
+
+
+def planet_coordinates(planet_id):
+    """
+    (galaxy, planet_number) of the planet with planet_id, without a query. Raises ValueError for an invalid id.
+    """
+    match = PLANET_ID_PATTERN.fullmatch(planet_id)
+    if not match:
+        raise ValueError(f"Invalid planet id {planet_id}")
+    return int(match[1]), int(match[2])
+
+
+def distance(origin, target):
+    """
+    Distance between two (galaxy, planet_number) slots.
+    """
+    if origin[0] != target[0]:
+        return abs(origin[0] - target[0]) * GALAXY_DISTANCE
+    return abs(origin[1] - target[1]) * PLANET_DISTANCE
+
+
+def distances(origins, targets):
+    """
+    distance for arrays of slots, shaped (n, 2) or broadcastable to it.
+    """
+    origins, targets = np.asarray(origins), np.asarray(targets)
+    galaxies = np.abs(origins[..., 0] - targets[..., 0])
+    planets = np.abs(origins[..., 1] - targets[..., 1])
+    return np.where(galaxies > 0, galaxies * GALAXY_DISTANCE, planets * PLANET_DISTANCE)
+
+
+def travel_time(distance, speed):
+    """
+    Seconds to travel distance at speed, rounded up. None for a fleet that cannot move (speed 0).
+    """
+    if not speed:
+        return None
+    return -(-distance * SECONDS_PER_HOUR // speed)
+
+
+def travel_times(distances, speeds):
+    """
+    travel_time for arrays, -1 where the speed is 0.
+    """
+    distances, speeds = np.asarray(distances, dtype=np.int64), np.asarray(speeds, dtype=np.int64)
+    return np.where(speeds > 0, -(-distances * SECONDS_PER_HOUR // np.maximum(speeds, 1)), -1)
+
+
+def fleet_travel_time(fleet, target_planet_id):
+    """
+    Seconds for the fleet to reach the planet with target_planet_id from its own planet.
+    """
+    return travel_time(distance(planet_coordinates(fleet.planet_id), planet_coordinates(target_planet_id)),
+                       fleet.speed)
+
+
+def fleet_travel_times(fleets, target_planet_id):
+    """
+    fleet_travel_time of many fleets, as an array in fleets order.
+    """
+    origins = np.array([planet_coordinates(fleet.planet_id) for fleet in fleets], dtype=np.int64).reshape(-1, 2)
+    target = np.array(planet_coordinates(target_planet_id), dtype=np.int64)
+    return travel_times(distances(origins, target), [fleet.speed for fleet in fleets])
@@ -0,0 +1,119 @@
+"""
+Troop counts of armies and fleets.
+
+Every troop of an army or fleet is one TroopCount row. Counts are only changed with single-row UPDATEs of F()
+expressions, e.g. count = count - 5 WHERE count >= 5, so moving units never reads or rewrites the other troops.
+Owners are given as lookups: {'army_id': army_id} or {'fleet_id': fleet_id}. Changes to a fleet's troops also update
+its summary columns (unit_count, attack_hp, defense_hp, cargo_space, speed) in the same transaction.
+"""
+import uuid
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, PositiveIntegerField, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from game_engine.constants.troop_stats import STAT_INDEX, TROOP_INDEX, TROOP_NAMES, TROOP_STATS, count_vector, \
+    max_travel_speeds, stat_totals
+from game_engine.models import Fleet, TroopCount
+
+TROOP_SPEED = Case(*[When(troop_name=troop_name, then=Value(int(TROOP_STATS[index, STAT_INDEX['speed']])))
+                     for troop_name, index in TROOP_INDEX.items()], output_field=PositiveIntegerField())
+
+
+def troop_counts(owner):
+    """
+    :return: {troop_name: count} of the owner's troops that have units
+    """
+    return dict(TroopCount.objects.filter(count__gt=0, **owner).values_list('troop_name', 'count'))
+
+
+def update_fleet_summary(fleet_id, counts):
+    """
+    Adds counts ({troop_name: count}, negative for units taken away) to the fleet's summary columns and recomputes
+    its speed from its troops, in one UPDATE. Call after changing the troops.
+    """
+    vector = count_vector(counts)
+    slowest = TroopCount.objects.filter(fleet_id=OuterRef('pk'), count__gt=0) \
+        .annotate(speed=TROOP_SPEED).order_by('speed').values('speed')[:1]
+    Fleet.objects.filter(pk=fleet_id).update(
+        unit_count=F('unit_count') + int(vector.sum()),
+        attack_hp=F('attack_hp') + int(stat_totals(vector, 'attack_hp')),
+        defense_hp=F('defense_hp') + int(stat_totals(vector, 'defense_hp')),
+        cargo_space=F('cargo_space') + int(stat_totals(vector, 'cargo_space')),
+        speed=Coalesce(Subquery(slowest), 0),
+    )
+
+
+def add_troops(owner, counts):
+    """
+    Adds counts ({troop_name: count}) to the owner's troops, creating the rows it does not have yet.
+    """
+    with transaction.atomic():
+        for troop_name, count in counts.items():
+            added = TroopCount.objects.filter(troop_name=troop_name, **owner).update(count=F('count') + count)
+            if not added:
+                TroopCount.objects.create(troop_name=troop_name, count=count, **owner)
+        if 'fleet_id' in owner:
+            update_fleet_summary(owner['fleet_id'], counts)
+
+
+def move_troops(counts, source, destination):
+    """
+    Moves counts ({troop_name: count}) of units from source to destination, in one transaction.
+    :return: (True, None), or (False, troop_name) for the first troop source has fewer units of
+    """
+    with transaction.atomic():
+        for troop_name, count in counts.items():
+            taken = TroopCount.objects.filter(troop_name=troop_name, count__gte=count, **source) \
+                .update(count=F('count') - count)
+            if not taken:
+                transaction.set_rollback(True)
+                return False, troop_name
+        if 'fleet_id' in source:
+            update_fleet_summary(source['fleet_id'], {troop_name: -count for troop_name, count in counts.items()})
+        add_troops(destination, counts)
+    return True, None
+
+
+def fleet_count_matrix(fleet_ids):
+    """
+    Count matrix of the fleets, one row per fleet in fleet_ids order, read with one query. Ids may be UUIDs or
+    strings.
+    """
+    rows = {uuid.UUID(str(fleet_id)): row for row, fleet_id in enumerate(fleet_ids)}
+    counts = np.zeros((len(fleet_ids), len(TROOP_NAMES)), dtype=np.int64)
+    for fleet_id, troop_name, count in TroopCount.objects.filter(fleet_id__in=rows, count__gt=0) \
+            .values_list('fleet_id', 'troop_name', 'count'):
+        counts[rows[fleet_id], TROOP_INDEX[troop_name]] = count
+    return counts
+
+
+def fleet_totals(fleet_ids):
+    """
+    Totals of many fleets at once, e.g. for leaderboards.
+    :return: {'troops': ..., 'attack_hp': ..., 'defense_hp': ..., 'cargo_space': ..., 'max_travel_speed': ...}, each
+             an array with one entry per fleet in fleet_ids order
+    """
+    counts = fleet_count_matrix(fleet_ids)
+    return {
+        'troops': counts.sum(axis=1),
+        'attack_hp': stat_totals(counts, 'attack_hp'),
+        'defense_hp': stat_totals(counts, 'defense_hp'),
+        'cargo_space': stat_totals(counts, 'cargo_space'),
+        'max_travel_speed': max_travel_speeds(counts),
+    }
+
+
+def refresh_fleet_summaries(fleet_ids):
+    """
+    Recomputes the summary columns of the fleets from their troops, with one read and one bulk update. For changes
+    made to TroopCount rows directly rather than through the functions above.
+    """
+    fleet_ids = list(fleet_ids)
+    totals = fleet_totals(fleet_ids)
+    fleets = [Fleet(pk=fleet_id, unit_count=int(totals['troops'][row]), attack_hp=int(totals['attack_hp'][row]),
+                    defense_hp=int(totals['defense_hp'][row]), cargo_space=int(totals['cargo_space'][row]),
+                    speed=int(totals['max_travel_speed'][row]))
+              for row, fleet_id in enumerate(fleet_ids)]
+    Fleet.objects.bulk_update(fleets, ['unit_count', 'attack_hp', 'defense_hp', 'cargo_space', 'speed'])
@@ -12,6 +12,9 @@ from .constants.game_constrants import TROOPS_DATA, TROOP_CHOICES, TROOP_COSTS
 from .serializers import *
 from .serializers import UserProfileSerializer
 from .utilities_functions.change_player_class import change_player_class
+from .background.troop_construction import settle_construction
+from .background.upgrade_queue import advance_upgrade_queue
+from .utilities_functions.resource_ledger import get_silo_ledger
 
 
 # Get all the current player's planet ids:
@@ -99,7 +102,7 @@ class SpecificBuildingViewSet(viewsets.ModelViewSet):
             if building_class is None:
                 raise NotFound("Building type not found")
 
-            self.queryset = building_class.objects.all()
+            self.queryset = building_class.objects.with_upgrade_level()
             self.serializer_class = self.get_building_serializer(building_type)
 
             planet_id = self.kwargs.get('planet_id', None)
@@ -109,9 +112,20 @@ class SpecificBuildingViewSet(viewsets.ModelViewSet):
                 except Planet.DoesNotExist:
                     raise NotFound("Planet not found")
 
-                return self.queryset.filter(planet=planet)
+                planet_ids = [planet.pk]
+                queryset = self.queryset.filter(planet=planet)
             else:
-                return self.queryset.filter(planet__owner=self.request.user)
+                planet_ids = Planet.objects.filter(owner=self.request.user).values_list('pk', flat=True)
+                queryset = self.queryset.filter(planet__owner=self.request.user)
+
+            # Upgrades and silo contents are applied lazily, bring them up to date before they are serialized
+            for planet_id in planet_ids:
+                advance_upgrade_queue(planet_id)
+            if building_class is Silo:
+                queryset = list(queryset)
+                for silo in queryset:
+                    get_silo_ledger().balances(silo)
+            return queryset
         else:
             raise NotFound("Building type not specified")
 
@@ -143,10 +157,16 @@ class BuildingViewSet(viewsets.ModelViewSet):
         planet_id = self.kwargs['planet_id']
         user = self.request.user
 
-        mine_queryset = Mine.objects.filter(planet_id=planet_id, planet__owner=user)
-        silo_queryset = Silo.objects.filter(planet_id=planet_id, planet__owner=user)
-        map_queryset = Map.objects.filter(planet_id=planet_id, planet__owner=user)
-        forge_queryset = Forge.objects.filter(planet_id=planet_id, planet__owner=user)
+        # Upgrades and silo contents are applied lazily, bring them up to date before they are serialized
+        if Planet.objects.filter(pk=planet_id, owner=user).exists():
+            advance_upgrade_queue(planet_id)
+
+        mine_queryset = Mine.objects.filter(planet_id=planet_id, planet__owner=user).with_upgrade_level()
+        silo_queryset = list(Silo.objects.filter(planet_id=planet_id, planet__owner=user).with_upgrade_level())
+        for silo in silo_queryset:
+            get_silo_ledger().balances(silo)
+        map_queryset = Map.objects.filter(planet_id=planet_id, planet__owner=user).with_upgrade_level()
+        forge_queryset = Forge.objects.filter(planet_id=planet_id, planet__owner=user).with_upgrade_level()
 
         return sorted(
             chain(mine_queryset, silo_queryset, map_queryset, forge_queryset),
@@ -176,10 +196,12 @@ class ForgeWithTroopsView(APIView):
             return Response({"error": "Planet not found"}, status=status.HTTP_404_NOT_FOUND)
 
         try:
-            forge = Forge.objects.get(planet=planet)
+            forge = Forge.objects.with_upgrade_level().get(planet=planet)
         except Forge.DoesNotExist:
             return Response({"error": "Forge not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        # Troops under construction are delivered lazily, bring them up to date before they are serialized
+        settle_construction(forge.army_id)
         try:
             army = Army.objects.get(planet=planet)
         except Army.DoesNotExist:
@@ -226,6 +248,7 @@ class CurrentPlanetDetailsView(generics.RetrieveAPIView):
     def get(self, request, *args, **kwargs):
         planet_id = self.kwargs.get('planet_id')
         planet = get_object_or_404(Planet, id=planet_id, owner=request.user)
+        advance_upgrade_queue(planet.pk)
         silo = get_object_or_404(Silo, planet=planet)
 
         user_profile = get_object_or_404(UserProfile, user=request.user)
@@ -233,7 +256,7 @@ class CurrentPlanetDetailsView(generics.RetrieveAPIView):
 
         data = {
             'planet_name': f'{planet.name} | {planet_id}',
-            'silo_resource_amounts': silo.stored_resources,
+            'silo_resource_amounts': get_silo_ledger().balances(silo),
             'orion_credits': orion_credits
         }
 
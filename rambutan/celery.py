@@ -14,13 +14,29 @@ app.autodiscover_tasks()
 
 # Celery beat Settings:
 
-# TODO: Schedule beat for adding generated resources
+# Silo resources are accrued lazily from Silo.last_accrued_at whenever a silo is read or spent from. The periodic
+# sweep only refreshes idle planets, fanned out over the workers by galaxy range.
 app.conf.beat_schedule = {
-    "update_silos_with_mine_production every second": {
+    "update_silos_with_mine_production": {
         "task": "game_engine.background.tasks.update_silos_with_mine_production",
-        "schedule": timedelta(seconds=10)
-
-    }
+        "schedule": timedelta(minutes=5),
+    },
+    "flush_silo_ledger": {
+        "task": "game_engine.background.tasks.flush_silo_ledger",
+        "schedule": timedelta(seconds=5),
+    },
+    "dispatch_due_events": {
+        "task": "game_engine.background.tasks.dispatch_due_events",
+        "schedule": timedelta(seconds=1),
+    },
+    "process_fleet_arrivals": {
+        "task": "game_engine.background.tasks.process_fleet_arrivals",
+        "schedule": timedelta(seconds=1),
+    },
+    "settle_construction_orders": {
+        "task": "game_engine.background.tasks.settle_construction_orders",
+        "schedule": timedelta(minutes=1),
+    },
 }
 
 
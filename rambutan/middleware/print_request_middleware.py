@@ -50,7 +50,7 @@ class PrintRequestMiddleware:
         print(f"Response content type: {response.headers.get('Content-Type', 'Unknown')}")  # updated line
 
         # If response content type is text-based, print the first 5 and last 5 lines
-        if any(ct in response['Content-Type'] for ct in ['text', 'json', 'xml']):
+        if any(ct in response.get('Content-Type', '') for ct in ['text', 'json', 'xml']):
             try:
                 lines = response.content.decode('utf-8').splitlines()
                 if len(lines) > 10:
@@ -179,7 +179,18 @@ CACHES = {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
             "PASSWORD": REDIS_PASSWORD,
         }
-    }
+    },
+    # Balances of the redis silo ledger, the only copy until they are flushed. Kept out of the default cache's
+    # database so cache.clear() never drops them. The instance must run with maxmemory-policy noeviction (use a
+    # separate one if the cache needs eviction).
+    "silo_ledger": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/2",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "PASSWORD": REDIS_PASSWORD,
+        }
+    },
 }
 
 # Celery settings
@@ -191,3 +202,11 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Africa/Johannesburg'
 
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+
+# Game engine settings
+SILO_LEDGER = 'database'  # Where silo balances live: 'database', or 'redis' (CACHES['silo_ledger'], write-behind to Postgres)
+SILO_SETTLE_CHUNK_SIZE = 500  # Silos loaded and written back per batch by update_silos_with_mine_production
+SILO_SETTLE_GALAXIES_PER_SHARD = 10  # Galaxies settled by each worker task, 0 settles all silos in one task
+GAME_EVENT_BATCH_SIZE = 500  # Due GameEvents claimed and applied per transaction by dispatch_due_events
+FLEET_ARRIVAL_BATCH_SIZE = 500  # Arrived FleetMovements claimed per transaction by process_fleet_arrivals
+GALAXY_MAP_CACHE_TIMEOUT = 60 * 60  # Seconds map tiles and players' map settings stay cached, unless cleared sooner by saves